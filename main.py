@@ -1,9 +1,10 @@
 import sublime
 import sublime_plugin
 
+import difflib
 import os
+import re
 import sys
-import threading
 
 # Load modules
 try:
@@ -37,6 +38,17 @@ except:
 sublime.set_timeout(lambda: load.xdebug(), 1000)
 
 
+def plugin_unloaded():
+    """
+    Release sockets and threads of sessions when package is unloaded or reloaded.
+    """
+    session.stop_sessions()
+
+
+# Sublime Text 2 calls unload handler of module instead
+unload_handler = plugin_unloaded
+
+
 # Define event listener for view(s)
 class EventListener(sublime_plugin.EventListener):
     def on_load(self, view):
@@ -49,6 +61,8 @@ class EventListener(sublime_plugin.EventListener):
         sublime.set_timeout(lambda: V.render_regions(view), 0)
 
     def on_activated(self, view):
+        # Use configuration of window which has been activated
+        config.activate_config(view.window())
         # Render breakpoint markers
         V.render_regions(view)
 
@@ -58,8 +72,7 @@ class EventListener(sublime_plugin.EventListener):
         V.render_regions(view)
         # Update config when settings file or sublime-project has been saved
         if filename and (filename.endswith(S.FILE_PACKAGE_SETTINGS) or filename.endswith('.sublime-project')):
-            config.load_package_values()
-            config.load_project_values()
+            config.reload_config()
         # TODO: Save new location of breakpoints on save
 
     def on_selection_modified(self, view):
@@ -80,7 +93,7 @@ class XdebugBreakpointCommand(sublime_plugin.TextCommand):
     """
     Add/Remove breakpoint(s) for rows (line numbers) in selection.
     """
-    def run(self, edit, rows=None, condition=None, enabled=None, filename=None):
+    def run(self, edit, rows=None, condition=None, enabled=None, filename=None, hit_value=None, hit_condition=None, log=None):
         # Get filename in current view and check if is a valid filename
         if filename is None:
             filename = self.view.file_name()
@@ -95,6 +108,16 @@ class XdebugBreakpointCommand(sublime_plugin.TextCommand):
         if rows is None:
             rows = V.region_to_rows(self.view.sel(), filter_empty=True)
 
+        # Hit count is only used when a positive value has been defined
+        hit = None
+        if hit_value is not None and (H.is_number(hit_value) or H.is_digit(hit_value)) and int(hit_value) > 0:
+            hit = {'hit_value': int(hit_value), 'hit_condition': hit_condition if hit_condition in dbgp.HIT_CONDITIONS else None}
+
+        # Expressions which are logged when breakpoint is hit, without breaking
+        log_expressions = None
+        if log is not None:
+            log_expressions = [expression.strip() for expression in log if expression.strip()] or None
+
         # Loop through rows
         for row in rows:
             expression = None
@@ -114,15 +137,23 @@ class XdebugBreakpointCommand(sublime_plugin.TextCommand):
             # Add/Enable breakpoint
             if not breakpoint_exists or enabled is True:
                 if row not in S.BREAKPOINT[filename]:
-                    S.BREAKPOINT[filename][row] = {'id': None, 'enabled': True, 'expression': expression}
+                    S.BREAKPOINT[filename][row] = {'id': None, 'enabled': True, 'expression': expression, 'hit_value': None, 'hit_condition': None, 'log': log_expressions}
+                    if hit is not None:
+                        S.BREAKPOINT[filename][row].update(hit)
                 else:
                     S.BREAKPOINT[filename][row]['enabled'] = True
                     if condition is not None:
                         S.BREAKPOINT[filename][row]['expression'] = expression
                     else:
                         expression = S.BREAKPOINT[filename][row]['expression']
+                    if hit_value is not None:
+                        S.BREAKPOINT[filename][row]['hit_value'] = hit['hit_value'] if hit else None
+                        S.BREAKPOINT[filename][row]['hit_condition'] = hit['hit_condition'] if hit else None
+                    if log is not None:
+                        S.BREAKPOINT[filename][row]['log'] = log_expressions
+                bp = S.BREAKPOINT[filename][row]
                 if session.is_connected(show_status=True):
-                    async_session = session.SocketHandler(session.ACTION_SET_BREAKPOINT, filename=filename, lineno=row, expression=expression)
+                    async_session = session.SocketHandler(session.ACTION_SET_BREAKPOINT, filename=filename, lineno=row, expression=expression, hit_value=bp.get('hit_value'), hit_condition=bp.get('hit_condition'))
                     async_session.start()
 
         # Render breakpoint markers
@@ -156,6 +187,60 @@ class XdebugConditionalBreakpointCommand(sublime_plugin.TextCommand):
         pass
 
 
+class XdebugHitBreakpointCommand(sublime_plugin.TextCommand):
+    """
+    Add breakpoint(s) for rows (line numbers) in selection, which break depending on number of times they are hit.
+    Hit count is entered as number with optional condition, for example '>= 5000', '== 3' or '% 10'.
+    """
+    def run(self, edit):
+        self.view.window().show_input_panel('Breakpoint hit count (>=, ==, %)', '', self.on_done, self.on_change, self.on_cancel)
+
+    def on_done(self, hit):
+        # Empty hit count removes hit count from breakpoint
+        if not hit.strip():
+            self.view.run_command('xdebug_breakpoint', {'hit_value': 0, 'enabled': True})
+            return
+        match = re.match(r'^\s*(>=|==|%)?\s*(\d+)\s*$', hit)
+        if not match or int(match.group(2)) == 0:
+            sublime.status_message('Xdebug: Invalid hit count, use a positive number with optional condition (>=, ==, %).')
+            return
+        self.view.run_command('xdebug_breakpoint', {'hit_value': int(match.group(2)), 'hit_condition': match.group(1) or dbgp.HIT_CONDITION_GREATER_OR_EQUAL, 'enabled': True})
+
+    def on_change(self, line):
+        pass
+
+    def on_cancel(self):
+        pass
+
+
+class XdebugLogBreakpointCommand(sublime_plugin.TextCommand):
+    """
+    Add logpoint(s) for rows (line numbers) in selection, which log values of expressions instead of breaking.
+    Each expression is entered separately (for example $id and then $item["name"]), until an empty expression is entered.
+    """
+    def run(self, edit):
+        self.expressions = []
+        self.show_input_panel()
+
+    def show_input_panel(self):
+        self.view.window().show_input_panel('Log expression %d (empty to finish)' % (len(self.expressions) + 1), '', self.on_done, self.on_change, self.on_cancel)
+
+    def on_done(self, expression):
+        # Ask for next expression, as expressions can contain any character
+        if expression.strip():
+            self.expressions.append(expression)
+            sublime.set_timeout(self.show_input_panel, 0)
+            return
+        # Without expressions logpoint turns back into a regular breakpoint
+        self.view.run_command('xdebug_breakpoint', {'log': self.expressions, 'enabled': True})
+
+    def on_change(self, line):
+        pass
+
+    def on_cancel(self):
+        pass
+
+
 class XdebugClearBreakpointsCommand(sublime_plugin.TextCommand):
     """
     Clear breakpoints in selected view.
@@ -232,16 +317,24 @@ class XdebugRunToLineCommand(sublime_plugin.WindowCommand):
         if rows is None or len(rows) == 0:
             return
         lineno = rows[0]
-        # Check if breakpoint does not already exists
-        breakpoint_exists = False
-        if filename in S.BREAKPOINT and lineno in S.BREAKPOINT[filename]:
-            breakpoint_exists = True
-        # Store line number and filename for temporary breakpoint in session
-        if not breakpoint_exists:
-            S.BREAKPOINT_RUN = {'filename': filename, 'lineno': lineno}
-        # Set breakpoint and run script
-        view.run_command('xdebug_breakpoint', {'rows': [lineno], 'enabled': True, 'filename': filename})
-        self.window.run_command('xdebug_execute', {'command': 'run'})
+        # Set temporary breakpoint and run script
+        async_session = session.SocketHandler(session.ACTION_RUN_TO_LINE, filename=filename, lineno=lineno)
+        async_session.start()
+
+    def is_enabled(self):
+        return S.BREAKPOINT_ROW is not None and session.is_connected()
+
+    def is_visible(self):
+        return S.BREAKPOINT_ROW is not None and session.is_connected()
+
+
+class XdebugProfileCommand(sublime_plugin.WindowCommand):
+    """
+    Run script and sample its stack at an interval, ignoring all breakpoints, until script has finished.
+    """
+    def run(self):
+        async_session = session.SocketHandler(session.ACTION_PROFILE)
+        async_session.start()
 
     def is_enabled(self):
         return S.BREAKPOINT_ROW is not None and session.is_connected()
@@ -255,17 +348,26 @@ class XdebugSessionStartCommand(sublime_plugin.WindowCommand):
     Start Xdebug session, listen for request response from debugger engine.
     """
     def run(self, launch_browser=False, restart=False):
-        # Define new session with DBGp protocol
+        # Use latest configuration for new session
+        config.reload_config()
+        # Continue with session which is waiting to be debugged, when current session has finished
+        if restart and S.SESSIONS:
+            S.SESSION_BUSY = False
+            session.focus_session(S.SESSIONS[0])
+            self.window.run_command('xdebug_layout')
+            return
+        # Define new session with DBGp protocol, which waits for connection from debugger engine
         S.SESSION = protocol.Protocol()
+        S.SESSION.listening = True
         S.SESSION_BUSY = False
+        session.start_worker()
         S.BREAKPOINT_EXCEPTION = None
         S.BREAKPOINT_ROW = None
         S.CONTEXT_DATA.clear()
+        S.CONTEXT_INDEX.clear()
         async_session = session.SocketHandler(session.ACTION_WATCH, check_watch_view=True)
         async_session.start()
-        # Remove temporary breakpoint
-        if S.BREAKPOINT_RUN is not None and S.BREAKPOINT_RUN['filename'] in S.BREAKPOINT and S.BREAKPOINT_RUN['lineno'] in S.BREAKPOINT[S.BREAKPOINT_RUN['filename']]:
-            self.window.active_view().run_command('xdebug_breakpoint', {'rows': [S.BREAKPOINT_RUN['lineno']], 'filename': S.BREAKPOINT_RUN['filename']})
+        # Temporary breakpoint only exists for duration of session
         S.BREAKPOINT_RUN = None
         # Set debug layout
         self.window.run_command('xdebug_layout')
@@ -273,25 +375,12 @@ class XdebugSessionStartCommand(sublime_plugin.WindowCommand):
         if launch_browser or (config.get_value(S.KEY_LAUNCH_BROWSER) and not restart):
             util.launch_browser()
 
-        # Start thread which will run method that listens for response on configured port
-        threading.Thread(target=self.listen).start()
-
-    def listen(self):
+        # Keep listening for connections on configured port, connection is handled when accepted
         try:
-            # Start listening for response from debugger engine
-            S.SESSION.listen()
-            # On connect run method which handles connection
-            if S.SESSION and S.SESSION.connected:
-                sublime.set_timeout(self.connected, 0)
+            session.start_listener()
         except (protocol.ProtocolListenException) as e:
             sublime.error_message('Unable to start Xdebug debugging session.\n\n%s' % e)
 
-    def connected(self):
-        sublime.set_timeout(lambda: sublime.status_message('Xdebug: Connected'), 100)
-
-        async_session = session.SocketHandler(session.ACTION_INIT)
-        async_session.start()
-
     def is_enabled(self):
         if S.SESSION:
             return False
@@ -328,6 +417,10 @@ class XdebugSessionStopCommand(sublime_plugin.WindowCommand):
     """
     def run(self, close_windows=False, launch_browser=False, restart=False):
         try:
+            session.stop_worker()
+            # Keep listening and waiting sessions when current session is restarted
+            if not restart:
+                session.stop_listener()
             S.SESSION.clear()
         except:
             pass
@@ -337,11 +430,10 @@ class XdebugSessionStopCommand(sublime_plugin.WindowCommand):
             S.BREAKPOINT_EXCEPTION = None
             S.BREAKPOINT_ROW = None
             S.CONTEXT_DATA.clear()
+            S.CONTEXT_INDEX.clear()
             async_session = session.SocketHandler(session.ACTION_WATCH, check_watch_view=True)
             async_session.start()
-            # Remove temporary breakpoint
-            if S.BREAKPOINT_RUN is not None and S.BREAKPOINT_RUN['filename'] in S.BREAKPOINT and S.BREAKPOINT_RUN['lineno'] in S.BREAKPOINT[S.BREAKPOINT_RUN['filename']]:
-                self.window.active_view().run_command('xdebug_breakpoint', {'rows': [S.BREAKPOINT_RUN['lineno']], 'filename': S.BREAKPOINT_RUN['filename']})
+            # Temporary breakpoint only exists for duration of session
             S.BREAKPOINT_RUN = None
         # Launch browser
         if launch_browser or (config.get_value(S.KEY_LAUNCH_BROWSER) and not restart):
@@ -372,6 +464,26 @@ class XdebugSessionStopCommand(sublime_plugin.WindowCommand):
         return False
 
 
+class XdebugSessionSwitchCommand(sublime_plugin.WindowCommand):
+    """
+    Switch to session which is waiting to be debugged, current session will be waiting until switched back to.
+    """
+    def run(self):
+        self.sessions = list(S.SESSIONS)
+        self.window.show_quick_panel([session.get_session_label(waiting_session) for waiting_session in self.sessions], self.callback)
+
+    def callback(self, index):
+        if index == -1 or index >= len(self.sessions):
+            return
+        session.focus_session(self.sessions[index])
+
+    def is_enabled(self):
+        return len(S.SESSIONS) > 0
+
+    def is_visible(self):
+        return len(S.SESSIONS) > 0
+
+
 class XdebugExecuteCommand(sublime_plugin.WindowCommand):
     """
     Execute command, handle breakpoints and reload session when page execution has completed.
@@ -412,8 +524,13 @@ class XdebugContinueCommand(sublime_plugin.WindowCommand):
             self.callback(command)
 
     def callback(self, command):
-        if command == -1 or S.SESSION_BUSY:
+        if command == -1:
             return
+        if S.SESSION_BUSY:
+            # Stop waiting for responses of commands which are only fetching data, so execution can continue
+            if not session.cancel_requests():
+                sublime.status_message('Xdebug: Session is busy, waiting for debugger engine.')
+                return
         if isinstance(command, int):
             command = self.command_index[command]
 
@@ -462,6 +579,60 @@ class XdebugEvaluateCommand(sublime_plugin.WindowCommand):
         return session.is_connected()
 
 
+class XdebugContextExpandCommand(sublime_plugin.WindowCommand):
+    """
+    Retrieve children of selected variable in context window which have not been received yet.
+    Selecting the ellipsis of a truncated variable retrieves the next page of children.
+    """
+    def run(self):
+        view = self.window.active_view()
+        entry = V.get_context_line_variable(view)
+        if entry is None:
+            sublime.status_message('Xdebug: No variable selected in context window.')
+            return
+        async_session = session.SocketHandler(session.ACTION_EXPAND_PROPERTY, row=entry['begin'], name=entry['variable'].fullname)
+        async_session.start()
+
+    def is_enabled(self):
+        view = self.window.active_view()
+        return session.is_connected() and view is not None and view.name() == V.TITLE_WINDOW_CONTEXT
+
+    def is_visible(self):
+        view = self.window.active_view()
+        return session.is_connected() and view is not None and view.name() == V.TITLE_WINDOW_CONTEXT
+
+
+class XdebugContextSearchCommand(sublime_plugin.WindowCommand):
+    """
+    Show quick panel with all variables in current context, selected variable is shown in context window.
+    """
+    def run(self):
+        self.variables = []
+        options = []
+        for entry in V.get_context_variables():
+            variable = entry['variable']
+            name = variable.fullname or variable.name
+            if not name:
+                continue
+            detail = variable.type if variable.type else ''
+            if variable.value is not None:
+                detail = '(%s) %s' % (detail, variable.value.replace('\r\n', '\n').replace('\n', ' '))
+            self.variables.append(entry['begin'])
+            options.append([name, detail])
+        self.window.show_quick_panel(options, self.callback)
+
+    def callback(self, index):
+        if index == -1:
+            return
+        V.show_context_variable(self.variables[index])
+
+    def is_enabled(self):
+        return session.is_connected() and V.has_debug_view(V.TITLE_WINDOW_CONTEXT) and bool(S.CONTEXT_INDEX)
+
+    def is_visible(self):
+        return session.is_connected() and V.has_debug_view(V.TITLE_WINDOW_CONTEXT)
+
+
 class XdebugUserExecuteCommand(sublime_plugin.WindowCommand):
     """
     Open input panel, allowing user to execute arbitrary command according to DBGp protocol.
@@ -595,16 +766,152 @@ class XdebugViewUpdateCommand(sublime_plugin.TextCommand):
     Keyword arguments:
     data -- Content data to populate sublime.Edit object with.
     readonly -- Make sublime.Edit object read only.
+    incremental -- Only replace lines which differ from current content.
+    fold -- Fold indentation blocks of lines which have been changed, when updating incrementally.
+    append -- Add content data at end of view, keeping current content.
     """
-    def run(self, edit, data=None, readonly=False):
+    def run(self, edit, data=None, readonly=False, incremental=False, fold=False, append=False):
         view = self.view
         view.set_read_only(False)
-        view.erase(edit, sublime.Region(0, view.size()))
-        if data is not None:
-            view.insert(edit, 0, data)
+        if append:
+            if data:
+                view.insert(edit, view.size(), data)
+        elif incremental and data and view.size() > 0:
+            self.update(edit, data, fold)
+        else:
+            view.erase(edit, sublime.Region(0, view.size()))
+            if data is not None:
+                view.insert(edit, 0, data)
         if readonly:
             view.set_read_only(True)
 
+    # Maximum number of lines of a block which are compared line by line, larger blocks are replaced as a whole
+    max_block_lines = 1000
+    # Maximum number of blocks which are compared, otherwise all content is replaced
+    max_blocks = 5000
+
+    def update(self, edit, data, fold=False):
+        view = self.view
+        old_lines = view.substr(sublime.Region(0, view.size())).splitlines(True)
+        new_lines = data.splitlines(True)
+        opcodes = self.get_changes(old_lines, new_lines)
+        if not opcodes:
+            return
+
+        # Offset of each line in current content
+        old_offsets = [0]
+        for line in old_lines:
+            old_offsets.append(old_offsets[-1] + len(line))
+
+        # Apply changes in reverse order, so offsets of preceding lines remain valid
+        for tag, i1, i2, j1, j2 in reversed(opcodes):
+            region = sublime.Region(old_offsets[i1], old_offsets[i2])
+            text = ''.join(new_lines[j1:j2])
+            if tag == 'insert':
+                view.insert(edit, region.a, text)
+            elif tag == 'delete':
+                view.erase(edit, region)
+            else:
+                view.replace(edit, region, text)
+
+        if fold:
+            changed = set()
+            for tag, i1, i2, j1, j2 in opcodes:
+                changed.update(range(j1, j2))
+            self.fold_changed(new_lines, changed)
+
+    def get_changes(self, old_lines, new_lines):
+        """
+        Get opcodes of lines which differ, by comparing blocks of top-level lines with their indented lines first
+        and only comparing lines within changed blocks which are not too large, so comparing is never quadratic
+        on the number of (repeating) lines of a large context.
+        """
+        old_blocks = self.get_blocks(old_lines)
+        new_blocks = self.get_blocks(new_lines)
+        if len(old_blocks) > self.max_blocks or len(new_blocks) > self.max_blocks:
+            return [('replace', 0, len(old_lines), 0, len(new_lines))]
+
+        old_text = [''.join(old_lines[start:end]) for start, end in old_blocks]
+        new_text = [''.join(new_lines[start:end]) for start, end in new_blocks]
+        opcodes = []
+        for tag, i1, i2, j1, j2 in self.get_matcher(old_text, new_text).get_opcodes():
+            if tag == 'equal':
+                continue
+            # Compare lines of each changed block with block at same position
+            if tag == 'replace' and i2 - i1 == j2 - j1:
+                for (old_start, old_end), (new_start, new_end) in zip(old_blocks[i1:i2], new_blocks[j1:j2]):
+                    if old_end - old_start > self.max_block_lines or new_end - new_start > self.max_block_lines:
+                        opcodes.append(('replace', old_start, old_end, new_start, new_end))
+                        continue
+                    for line_tag, k1, k2, l1, l2 in self.get_matcher(old_lines[old_start:old_end], new_lines[new_start:new_end]).get_opcodes():
+                        if line_tag != 'equal':
+                            opcodes.append((line_tag, old_start + k1, old_start + k2, new_start + l1, new_start + l2))
+                continue
+            old_start, old_end = self.get_block_lines(old_blocks, i1, i2, len(old_lines))
+            new_start, new_end = self.get_block_lines(new_blocks, j1, j2, len(new_lines))
+            opcodes.append((tag, old_start, old_end, new_start, new_end))
+        return opcodes
+
+    def get_matcher(self, a, b):
+        """
+        Get sequence matcher for comparing lines, without treating frequent lines as junk.
+        """
+        try:
+            return difflib.SequenceMatcher(None, a, b, autojunk=False)
+        except TypeError:
+            # Python 2.6 has no option to disable junk heuristic
+            return difflib.SequenceMatcher(None, a, b)
+
+    def get_blocks(self, lines):
+        """
+        Get start and end line of each top-level line together with its indented lines.
+        """
+        blocks = []
+        for index, line in enumerate(lines):
+            if blocks and line.startswith('\t'):
+                blocks[-1][1] = index + 1
+            else:
+                blocks.append([index, index + 1])
+        return blocks
+
+    def get_block_lines(self, blocks, start, end, count):
+        """
+        Get start and end line of range of blocks, which is empty at position of start block when range is empty.
+        """
+        first = blocks[start][0] if start < len(blocks) else count
+        last = blocks[end - 1][1] if end > start else first
+        return first, last
+
+    def fold_changed(self, lines, changed):
+        """
+        Fold indentation blocks of which the parent line or any child line has been changed,
+        unchanged blocks keep their fold state.
+        """
+        regions = []
+        offset = 0
+        parent = None
+        block_start = None
+        block_changed = False
+        for index, line in enumerate(lines):
+            if line.startswith('\t'):
+                # Start of indentation block, from end of parent line
+                if block_start is None and parent is not None:
+                    block_start = offset - 1
+                    block_changed = parent in changed
+                if index in changed:
+                    block_changed = True
+            else:
+                if block_start is not None and block_changed:
+                    regions.append(sublime.Region(block_start, offset - 1))
+                block_start = None
+                parent = index
+            offset += len(line)
+        if block_start is not None and block_changed:
+            end = offset - 1 if lines[-1].endswith('\n') else offset
+            regions.append(sublime.Region(block_start, end))
+        if regions:
+            self.view.fold(regions)
+
 
 class XdebugLayoutCommand(sublime_plugin.WindowCommand):
     """
@@ -0,0 +1,79 @@
+"""
+Benchmark sanitizing of response data against previous implementation,
+which converted entity/character references and replaced invalid XML characters in separate passes.
+
+Usage: python tests/benchmark/sanitize.py
+"""
+import os
+import re
+import sys
+import timeit
+import types
+
+# Sublime Text API is not available outside of editor, which is not used by sanitizer
+sys.modules.setdefault('sublime', types.ModuleType('sublime'))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from xdebug import protocol  # noqa: E402
+from xdebug.helper import H  # noqa: E402
+
+ILLEGAL_XML_RANGES = [
+    '%s-%s' % (H.unicode_chr(low), H.unicode_chr(high))
+    for (low, high) in protocol.ILLEGAL_XML_UNICODE_CHARACTERS
+    if low < sys.maxunicode
+]
+
+ILLEGAL_XML_RE = re.compile(H.unicode_string('[%s]') % H.unicode_string('').join(ILLEGAL_XML_RANGES))
+
+
+def previous_sanitize(data):
+    def convert(matches):
+        text = matches.group(0)
+        if text[:2] == '&#':
+            try:
+                if text[:3] == '&#x':
+                    return H.unicode_chr(int(text[3:-1], 16))
+                else:
+                    return H.unicode_chr(int(text[2:-1]))
+            except ValueError:
+                pass
+        else:
+            try:
+                if text[1:-1] in ('amp', 'apos', 'gt', 'lt', 'quot'):
+                    pass
+                else:
+                    text = H.unicode_chr(protocol.name2codepoint[text[1:-1]])
+            except KeyError:
+                pass
+        return text
+    data = re.sub(r'&#?\w+;', convert, data)
+    return ILLEGAL_XML_RE.sub('?', data)
+
+
+def generate_response(value, count=500):
+    properties = H.unicode_string('').join(
+        H.unicode_string('<property name="$var%d" fullname="$var%d" type="string"><![CDATA[%s]]></property>') % (i, i, value)
+        for i in range(count)
+    )
+    return H.unicode_string('<response xmlns="urn:debugger_protocol_v1" command="context_get" transaction_id="1">%s</response>') % properties
+
+
+PAYLOADS = [
+    ('ascii', generate_response(H.unicode_string('Lorem ipsum dolor sit amet ') * 8)),
+    ('unicode', generate_response(H.unicode_string('Gr%sn %s caf%s ') % (H.unicode_chr(0xFC), H.unicode_chr(0x20AC), H.unicode_chr(0xE9)) * 8)),
+    ('entities', generate_response(H.unicode_string('&lt;p&gt;caf&eacute; &amp; cr&egrave;me&nbsp;&#8364; &#x41;') * 8)),
+    ('binary', generate_response(H.unicode_string('').join(H.unicode_chr(i % 256) for i in range(216)))),
+]
+
+
+def main(number=50):
+    print('%-10s %12s %12s %8s' % ('payload', 'previous ms', 'current ms', 'speedup'))
+    for (name, data) in PAYLOADS:
+        assert protocol.sanitize_data(data) == previous_sanitize(data)
+        previous = timeit.timeit(lambda: previous_sanitize(data), number=number) / number * 1000
+        current = timeit.timeit(lambda: protocol.sanitize_data(data), number=number) / number * 1000
+        print('%-10s %12.3f %12.3f %7.1fx' % (name, previous, current, previous / current))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import os
+try:
+    from xdebug.unittesting import XdebugDeferrableTestCase
+except:
+    from SublimeTextXdebug.xdebug.unittesting import XdebugDeferrableTestCase
+
+
+class TestBreakpointHit(XdebugDeferrableTestCase):
+    breakpoint_hit_file = 'breakpoint_hit.php'
+    breakpoint_hit_file_local_path = os.path.join(XdebugDeferrableTestCase.local_path, breakpoint_hit_file)
+
+    def set_hit_breakpoint(self, filename, lineno, hit_value, hit_condition):
+        self.run_command('xdebug_breakpoint', {'enabled': True, 'filename': filename, 'rows': [str(lineno)], 'hit_value': hit_value, 'hit_condition': hit_condition})
+
+    def test_hit_value_greater_or_equal(self):
+        self.set_hit_breakpoint(self.breakpoint_hit_file_local_path, 5, 3, '>=')
+
+        self.run_command('xdebug_session_start')
+        yield self.window_has_debug_layout
+
+        breakpoint_view = self.get_view_by_title('Xdebug Breakpoint')
+        context_view = self.get_view_by_title('Xdebug Context')
+        stack_view = self.get_view_by_title('Xdebug Stack')
+
+        self.assertViewContains(breakpoint_view, '=> {file_local_path}\n\t|+| 5 (hit >= 3)'.format(file_local_path=self.breakpoint_hit_file_local_path))
+        self.assertViewIsEmpty(context_view)
+        self.assertViewIsEmpty(stack_view)
+
+        self.send_server_request(path=self.breakpoint_hit_file)
+
+        def context_and_stack_have_content():
+            return not self.view_is_empty(context_view) and not self.view_is_empty(stack_view)
+        yield context_and_stack_have_content
+
+        # Third hit is first one to break
+        self.assertViewContains(context_view, '$i = (int) 2')
+        self.assertViewContains(context_view, '$total = (int) 1')
+        self.assertViewContains(stack_view, '[0] file://{remote_path}/{file}:5, {{main}}()'.format(remote_path=self.remote_path, file=self.breakpoint_hit_file))
+
+        context_view_contents = self.get_contents_of_view(context_view)
+
+        def context_has_different_content():
+            return self.get_contents_of_view(context_view) != context_view_contents
+
+        # Each following hit breaks as well
+        self.run_command('xdebug_execute', {'command': 'run'})
+        yield context_has_different_content
+        yield context_and_stack_have_content
+
+        self.assertViewContains(context_view, '$i = (int) 3')
+        self.assertViewContains(context_view, '$total = (int) 3')
+
+    def test_hit_value_replaces_breakpoint(self):
+        self.set_breakpoint(self.breakpoint_hit_file_local_path, 5)
+
+        self.run_command('xdebug_session_start')
+        yield self.window_has_debug_layout
+
+        breakpoint_view = self.get_view_by_title('Xdebug Breakpoint')
+        context_view = self.get_view_by_title('Xdebug Context')
+        stack_view = self.get_view_by_title('Xdebug Stack')
+
+        self.assertViewContains(breakpoint_view, '=> {file_local_path}\n\t|+| 5\n'.format(file_local_path=self.breakpoint_hit_file_local_path))
+        self.assertViewIsEmpty(context_view)
+        self.assertViewIsEmpty(stack_view)
+
+        self.send_server_request(path=self.breakpoint_hit_file)
+
+        def context_and_stack_have_content():
+            return not self.view_is_empty(context_view) and not self.view_is_empty(stack_view)
+        yield context_and_stack_have_content
+
+        self.assertViewContains(context_view, '$i = (int) 0')
+        self.assertViewContains(stack_view, '[0] file://{remote_path}/{file}:5, {{main}}()'.format(remote_path=self.remote_path, file=self.breakpoint_hit_file))
+
+        # Breakpoint is removed from debugger engine and set again with hit count, which starts counting from zero
+        self.set_hit_breakpoint(self.breakpoint_hit_file_local_path, 5, 3, '==')
+        self.assertViewContains(breakpoint_view, '=> {file_local_path}\n\t|+| 5 (hit == 3)'.format(file_local_path=self.breakpoint_hit_file_local_path))
+
+        context_view_contents = self.get_contents_of_view(context_view)
+
+        def context_has_different_content():
+            return self.get_contents_of_view(context_view) != context_view_contents
+
+        self.run_command('xdebug_execute', {'command': 'run'})
+        yield context_has_different_content
+        yield context_and_stack_have_content
+
+        # Previous breakpoint would have been hit on next iteration
+        self.assertViewContains(context_view, '$i = (int) 3')
+        self.assertViewContains(context_view, '$total = (int) 3')
+        self.assertViewContains(stack_view, '[0] file://{remote_path}/{file}:5, {{main}}()'.format(remote_path=self.remote_path, file=self.breakpoint_hit_file))
@@ -0,0 +1,103 @@
+import json
+import os
+import sublime
+try:
+    from xdebug.unittesting import XdebugDeferrableTestCase
+except:
+    from SublimeTextXdebug.xdebug.unittesting import XdebugDeferrableTestCase
+
+
+class TestBreakpointLog(XdebugDeferrableTestCase):
+    # Loop of hit count breakpoint tests is reused for logging values of each iteration
+    breakpoint_hit_file = 'breakpoint_hit.php'
+    breakpoint_hit_file_local_path = os.path.join(XdebugDeferrableTestCase.local_path, breakpoint_hit_file)
+    logpoint_output_path = os.path.join(sublime.packages_path(), 'User', 'Xdebug.logpoints.jsonl')
+
+    def remove_logpoint_output(self):
+        for path in (self.logpoint_output_path, self.logpoint_output_path + '.1'):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def read_logpoint_output(self):
+        with open(self.logpoint_output_path, 'r') as output:
+            return [json.loads(line) for line in output if line.strip()]
+
+    def set_logpoint(self, filename, lineno, expressions):
+        self.run_command('xdebug_breakpoint', {'enabled': True, 'filename': filename, 'rows': [str(lineno)], 'log': expressions})
+
+    def test_log_without_breaking(self):
+        self.remove_logpoint_output()
+        self.set_logpoint(self.breakpoint_hit_file_local_path, 5, ['$i', '$total'])
+        self.set_breakpoint(self.breakpoint_hit_file_local_path, 7)
+
+        self.run_command('xdebug_session_start')
+        yield self.window_has_debug_layout
+
+        breakpoint_view = self.get_view_by_title('Xdebug Breakpoint')
+        context_view = self.get_view_by_title('Xdebug Context')
+        stack_view = self.get_view_by_title('Xdebug Stack')
+
+        self.assertViewContains(breakpoint_view, '=> {file_local_path}\n\t|+| 5 (log)\n\t|+| 7'.format(file_local_path=self.breakpoint_hit_file_local_path))
+        self.assertViewIsEmpty(context_view)
+        self.assertViewIsEmpty(stack_view)
+
+        self.send_server_request(path=self.breakpoint_hit_file)
+
+        def context_and_stack_have_content():
+            return not self.view_is_empty(context_view) and not self.view_is_empty(stack_view)
+        yield context_and_stack_have_content
+
+        # Script only breaks on regular breakpoint, after each iteration has been logged
+        self.assertViewContains(context_view, '$i = (int) 5')
+        self.assertViewContains(context_view, '$total = (int) 10')
+        self.assertViewContains(stack_view, '[0] file://{remote_path}/{file}:7, {{main}}()'.format(remote_path=self.remote_path, file=self.breakpoint_hit_file))
+
+        # Output file has a record for each hit, in order of execution
+        records = self.read_logpoint_output()
+        self.assertEqual([record['file'] for record in records], [self.breakpoint_hit_file_local_path] * 5)
+        self.assertEqual([record['line'] for record in records], [5] * 5)
+        self.assertEqual([record['values'] for record in records], [
+            {'$i': '0', '$total': '0'},
+            {'$i': '1', '$total': '0'},
+            {'$i': '2', '$total': '1'},
+            {'$i': '3', '$total': '3'},
+            {'$i': '4', '$total': '6'}
+        ])
+
+        # Output panel shows values of each hit
+        log_panel = sublime.active_window().find_output_panel('xdebug_log')
+
+        def log_panel_has_content():
+            return not self.view_is_empty(log_panel)
+        yield log_panel_has_content
+
+        for (i, total) in ((0, 0), (1, 0), (2, 1), (3, 3), (4, 6)):
+            self.assertViewContains(log_panel, '{file_local_path}:5 $i = "{i}", $total = "{total}"\n'.format(file_local_path=self.breakpoint_hit_file_local_path, i=i, total=total))
+
+        self.remove_logpoint_output()
+
+    def test_log_run_to_end(self):
+        self.remove_logpoint_output()
+        self.set_logpoint(self.breakpoint_hit_file_local_path, 5, ['$i'])
+
+        self.run_command('xdebug_session_start')
+        yield self.window_has_debug_layout
+
+        breakpoint_view = self.get_view_by_title('Xdebug Breakpoint')
+        context_view = self.get_view_by_title('Xdebug Context')
+        stack_view = self.get_view_by_title('Xdebug Stack')
+
+        self.assertViewContains(breakpoint_view, '=> {file_local_path}\n\t|+| 5 (log)'.format(file_local_path=self.breakpoint_hit_file_local_path))
+
+        self.send_server_request(path=self.breakpoint_hit_file)
+
+        # Output is written when script has finished, without ever breaking
+        def logpoint_output_is_written():
+            return os.path.isfile(self.logpoint_output_path) and len(self.read_logpoint_output()) == 5
+        yield logpoint_output_is_written
+
+        self.assertEqual([record['values'] for record in self.read_logpoint_output()], [{'$i': str(i)} for i in range(5)])
+        self.assertViewIsEmpty(context_view)
+        self.assertViewIsEmpty(stack_view)
+
+        self.remove_logpoint_output()
@@ -0,0 +1,109 @@
+import os
+import sublime
+try:
+    from xdebug.unittesting import XdebugDeferrableTestCase
+except:
+    from SublimeTextXdebug.xdebug.unittesting import XdebugDeferrableTestCase
+
+
+class TestBreakpointRunToLine(XdebugDeferrableTestCase):
+    breakpoint_step_file = 'breakpoint_step.php'
+    breakpoint_step_file_local_path = os.path.join(XdebugDeferrableTestCase.local_path, breakpoint_step_file)
+
+    def select_line(self, lineno):
+        view = self.get_view_by_title(self.breakpoint_step_file_local_path)
+        point = view.text_point(lineno - 1, 0)
+        view.sel().clear()
+        view.sel().add(sublime.Region(point))
+        sublime.active_window().focus_view(view)
+
+    def test_run_to_line(self):
+        self.set_breakpoint(self.breakpoint_step_file_local_path, 11)
+
+        self.run_command('xdebug_session_start')
+        yield self.window_has_debug_layout
+
+        breakpoint_view = self.get_view_by_title('Xdebug Breakpoint')
+        context_view = self.get_view_by_title('Xdebug Context')
+        stack_view = self.get_view_by_title('Xdebug Stack')
+
+        self.assertViewContains(breakpoint_view, '=> {file_local_path}\n\t|+| 11'.format(file_local_path=self.breakpoint_step_file_local_path))
+        self.assertViewIsEmpty(context_view)
+        self.assertViewIsEmpty(stack_view)
+
+        self.send_server_request(path=self.breakpoint_step_file)
+
+        def context_and_stack_have_content():
+            return not self.view_is_empty(context_view) and not self.view_is_empty(stack_view)
+        yield context_and_stack_have_content
+
+        self.assertViewContains(context_view, '$greeting = <uninitialized>')
+        self.assertViewContains(stack_view, '[0] file://{remote_path}/{file}:11, {{main}}()'.format(remote_path=self.remote_path, file=self.breakpoint_step_file))
+
+        def file_is_opened():
+            view = self.get_view_by_title(self.breakpoint_step_file_local_path)
+            return view is not None and not view.is_loading()
+        yield file_is_opened
+
+        context_view_contents = self.get_contents_of_view(context_view)
+        stack_view_contents = self.get_contents_of_view(stack_view)
+
+        def context_and_stack_have_different_content():
+            return self.get_contents_of_view(context_view) != context_view_contents and self.get_contents_of_view(stack_view) != stack_view_contents
+
+        self.select_line(6)
+        self.run_command('xdebug_run_to_line')
+        yield context_and_stack_have_different_content
+        yield context_and_stack_have_content
+
+        self.assertViewContains(context_view, '$greet = (string) Hi')
+        self.assertViewContains(context_view, '$name = (string) Stranger')
+        self.assertViewContains(stack_view, '[0] file://{remote_path}/{file}:6, greet()'.format(remote_path=self.remote_path, file=self.breakpoint_step_file))
+
+        # Temporary breakpoint is not added to breakpoint list
+        self.assertViewContains(breakpoint_view, '=> {file_local_path}\n\t|+| 11\n'.format(file_local_path=self.breakpoint_step_file_local_path))
+        self.assertFalse(self.view_contains_content(breakpoint_view, '|+| 6'))
+
+    def test_run_to_line_skips_breakpoints(self):
+        self.set_breakpoint(self.breakpoint_step_file_local_path, 4)
+        self.set_breakpoint(self.breakpoint_step_file_local_path, 11)
+
+        self.run_command('xdebug_session_start')
+        yield self.window_has_debug_layout
+
+        breakpoint_view = self.get_view_by_title('Xdebug Breakpoint')
+        context_view = self.get_view_by_title('Xdebug Context')
+        stack_view = self.get_view_by_title('Xdebug Stack')
+
+        self.assertViewContains(breakpoint_view, '=> {file_local_path}\n\t|+| 4\n\t|+| 11'.format(file_local_path=self.breakpoint_step_file_local_path))
+        self.assertViewIsEmpty(context_view)
+        self.assertViewIsEmpty(stack_view)
+
+        self.send_server_request(path=self.breakpoint_step_file)
+
+        def context_and_stack_have_content():
+            return not self.view_is_empty(context_view) and not self.view_is_empty(stack_view)
+        yield context_and_stack_have_content
+
+        self.assertViewContains(stack_view, '[0] file://{remote_path}/{file}:11, {{main}}()'.format(remote_path=self.remote_path, file=self.breakpoint_step_file))
+
+        def file_is_opened():
+            view = self.get_view_by_title(self.breakpoint_step_file_local_path)
+            return view is not None and not view.is_loading()
+        yield file_is_opened
+
+        context_view_contents = self.get_contents_of_view(context_view)
+        stack_view_contents = self.get_contents_of_view(stack_view)
+
+        def context_and_stack_have_different_content():
+            return self.get_contents_of_view(context_view) != context_view_contents and self.get_contents_of_view(stack_view) != stack_view_contents
+
+        # Breakpoint on line 4 is hit before line 6 is reached, which should not break
+        self.select_line(6)
+        self.run_command('xdebug_run_to_line')
+        yield context_and_stack_have_different_content
+        yield context_and_stack_have_content
+
+        self.assertViewContains(context_view, '$greet = (string) Hi')
+        self.assertViewContains(stack_view, '[0] file://{remote_path}/{file}:6, greet()'.format(remote_path=self.remote_path, file=self.breakpoint_step_file))
+        self.assertViewContains(breakpoint_view, '=> {file_local_path}\n\t|+| 4\n\t|+| 11\n'.format(file_local_path=self.breakpoint_step_file_local_path))
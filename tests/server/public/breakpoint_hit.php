@@ -0,0 +1,7 @@
+<?php
+
+$total = 0;
+for ($i = 0; $i < 5; $i++) {
+    $total += $i;
+}
+echo $total;
@@ -0,0 +1,360 @@
+"""
+Unit tests for communication with debugger engine, which run without Sublime Text over a pair of connected sockets.
+
+Usage: python -m unittest discover tests/unit
+"""
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import types
+import unittest
+
+# Sublime Text API is not available outside of editor, which is not used by protocol
+sys.modules.setdefault('sublime', types.ModuleType('sublime'))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmark')))
+
+from sanitize import PAYLOADS, previous_sanitize  # noqa: E402
+from xdebug import protocol  # noqa: E402
+from xdebug import settings as S  # noqa: E402
+from xdebug.config import Config  # noqa: E402
+from xdebug.helper import H  # noqa: E402
+from xdebug.replay import RECORD_RECEIVED, RECORD_SENT, Recorder, read_recording  # noqa: E402
+
+
+def frame(data):
+    """
+    Frame message as sent by debugger engine: length of data, NULL byte, data, NULL byte.
+    """
+    if not isinstance(data, bytes):
+        data = data.encode('utf8')
+    return str(len(data)).encode('ascii') + b'\x00' + data + b'\x00'
+
+
+def response(transaction_id, content='', **attributes):
+    attributes = ''.join(' %s="%s"' % pair for pair in sorted(attributes.items()))
+    return H.unicode_string('<response xmlns="urn:debugger_protocol_v1" transaction_id="%s"%s>%s</response>') % (transaction_id, attributes, content)
+
+
+def set_config(**values):
+    S.CONFIG = Config(values)
+
+
+class FrameReaderTestCase(unittest.TestCase):
+    def setUp(self):
+        set_config()
+        self.engine, self.connection = socket.socketpair()
+
+    def tearDown(self):
+        self.engine.close()
+        self.connection.close()
+
+    def receive_frames(self, reader, data):
+        """
+        Send data and receive it in parts, returns data of complete frames.
+        """
+        self.engine.sendall(data)
+        frames = []
+        received = 0
+        while received < len(data):
+            received += reader.receive(self.connection)
+            frame = reader.next_frame()
+            while frame is not None:
+                frames.append(bytes(frame[:len(frame)]))
+                protocol.close_frame(frame)
+                frame = reader.next_frame()
+        return frames
+
+    def test_frames(self):
+        reader = protocol.FrameReader()
+        self.assertEqual(self.receive_frames(reader, frame('<init/>') + frame('') + frame('<response/>')), [b'<init/>', b'', b'<response/>'])
+
+    def test_invalid_length(self):
+        reader = protocol.FrameReader()
+        self.engine.sendall(b'12a\x00<response/>\x00')
+        reader.receive(self.connection)
+        self.assertRaises(protocol.ProtocolException, reader.next_frame)
+
+    def test_length_mismatch(self):
+        reader = protocol.FrameReader()
+        self.engine.sendall(b'5\x00<response/>\x00')
+        reader.receive(self.connection)
+        self.assertRaises(protocol.ProtocolException, reader.next_frame)
+
+    def test_length_mismatch_spilled(self):
+        reader = protocol.FrameReader(spill_size=2)
+        self.assertRaises(protocol.ProtocolException, self.receive_frames, reader, b'5\x00<response/>\x00')
+
+    def test_connection_closed(self):
+        reader = protocol.FrameReader()
+        self.engine.close()
+        self.assertRaises(protocol.ProtocolConnectionException, reader.receive, self.connection)
+
+    def test_spilled_frame(self):
+        data = response(1, '<property><![CDATA[%s]]></property>' % ('x' * 200000)).encode('utf8')
+        consumed = []
+        reader = protocol.FrameReader(spill_size=1024, consumer=lambda part: consumed.append(bytes(part)))
+        self.engine.sendall(frame(data))
+        received = 0
+        frame_data = None
+        while frame_data is None:
+            received += reader.receive(self.connection)
+            frame_data = reader.next_frame()
+        self.assertTrue(isinstance(frame_data, protocol.SpilledFrame))
+        self.assertEqual(len(frame_data), len(data))
+        self.assertEqual(frame_data[:len(frame_data)], data)
+        self.assertEqual(b''.join(consumed), data)
+        protocol.close_frame(frame_data)
+        self.assertTrue(frame_data.file.closed)
+
+    def test_consumer(self):
+        consumed = []
+        reader = protocol.FrameReader(consumer=lambda part: consumed.append(bytes(part)))
+        self.receive_frames(reader, frame('<init/>') + frame('<response/>'))
+        self.assertEqual(b''.join(consumed), b'<init/><response/>')
+
+
+class ResponseParserTestCase(unittest.TestCase):
+    def setUp(self):
+        set_config()
+
+    def parse(self, data, size=1, handler=None, errors='replace'):
+        """
+        Feed data to parser in parts of given size, returns XML document object.
+        """
+        parser = protocol.ResponseParser(protocol.sanitize_data, handler, errors)
+        for offset in range(0, len(data), size):
+            parser.feed(data[offset:offset + size])
+        return parser.close()
+
+    def test_multibyte_characters_split(self):
+        value = H.unicode_string('Gr%sn %s') % (H.unicode_chr(0xFC), H.unicode_chr(0x20AC))
+        # Character of four bytes, when supported by build of Python
+        if sys.maxunicode > 0xFFFF:
+            value += H.unicode_chr(0x1F600)
+        data = response(1, '<property name="$naive">%s</property>' % value).encode('utf8')
+        for size in (1, 2, 3, 7):
+            document = self.parse(data, size)
+            self.assertEqual(document[0].text, value)
+
+    def test_references_split(self):
+        data = response(1, '<property>caf&eacute; &#8364; &amp; &#x41;</property>').encode('utf8')
+        document = self.parse(data, 1)
+        self.assertEqual(document[0].text, H.unicode_string('caf%s %s & A') % (H.unicode_chr(0xE9), H.unicode_chr(0x20AC)))
+
+    def test_invalid_utf8(self):
+        data = response(1, '<property>x</property>').encode('utf8').replace(b'>x<', b'>\xe9\xff<')
+        document = self.parse(data, 1, errors=protocol.get_decoding_errors('iso-8859-1'))
+        self.assertEqual(document[0].text, H.unicode_chr(0xE9) + H.unicode_chr(0xFF))
+
+    def test_declared_encoding(self):
+        idekey = H.unicode_chr(0xE9) + H.unicode_chr(0x20AC)
+        data = H.unicode_string('<?xml version="1.0" encoding="iso-8859-1"?>\n<init idekey="%s"/>') % idekey
+        document = self.parse(data.encode('utf8'), 5)
+        self.assertEqual(document.get('idekey'), idekey)
+
+    def test_handler_removes_elements(self):
+        handled = []
+
+        def handler(child, document):
+            handled.append(child.get('name'))
+            return child.get('name') != '$keep'
+        data = response(1, '<property name="$a"/><property name="$keep"/><property name="$b"/>').encode('utf8')
+        document = self.parse(data, 4, handler)
+        self.assertEqual(handled, ['$a', '$keep', '$b'])
+        self.assertEqual([child.get('name') for child in document], ['$keep'])
+
+    def test_invalid_response(self):
+        self.assertRaises(Exception, self.parse, b'<response><property></response>', 3)
+
+
+class SanitizeTestCase(unittest.TestCase):
+    def test_previous_output(self):
+        for (name, data) in PAYLOADS:
+            self.assertEqual(protocol.sanitize_data(data), previous_sanitize(data), name)
+
+    def test_unescape(self):
+        data = H.unicode_string('&lt;&eacute;&unknown;&#xZZ;\x01')
+        self.assertEqual(protocol.sanitize_data(data), H.unicode_string('&lt;%s&unknown;&#xZZ;?') % H.unicode_chr(0xE9))
+        self.assertEqual(protocol.sanitize_data(data, False), H.unicode_string('&lt;&eacute;&unknown;&#xZZ;?'))
+
+
+class ProtocolTestCase(unittest.TestCase):
+    def setUp(self):
+        set_config(max_response_memory=1024)
+        self.loop = protocol.EventLoop()
+        self.loop.start()
+        self.engine, connection = socket.socketpair()
+        self.session = protocol.Protocol()
+        self.session.attach(connection, self.loop)
+
+    def tearDown(self):
+        self.session.clear()
+        self.engine.close()
+        self.loop.stop()
+        self.loop.thread.join(5)
+        S.CONFIG = None
+
+    def read_command(self):
+        data = b''
+        while not data.endswith(b'\x00'):
+            data += self.engine.recv(1)
+        return data[:-1].decode('utf8')
+
+    def test_init(self):
+        self.engine.sendall(frame('<init idekey="sublime.xdebug"/>'))
+        self.assertEqual(self.session.read().get('idekey'), 'sublime.xdebug')
+
+    def test_route_by_transaction_id(self):
+        properties = []
+        context = self.session.request('context_get', handler=lambda child, document: properties.append(child.get('name')))
+        stack = self.session.request('stack_get')
+        self.assertEqual(self.read_command(), 'context_get -i 1')
+        self.assertEqual(self.read_command(), 'stack_get -i 2')
+        # Responses are matched by transaction ID, regardless of order
+        self.engine.sendall(frame(response(2, '<stack level="0"/>')) + frame(response(1, '<property name="$a"/><property name="$b"/>' * 300)))
+        self.assertEqual(stack.result()[0].get('level'), '0')
+        self.assertEqual(len(context.result()), 0)
+        self.assertEqual(properties, ['$a', '$b'] * 300)
+
+    def test_raw_response(self):
+        self.session.send('eval', expression='1')
+        self.engine.sendall(frame(response(1, 'done')))
+        self.assertEqual(self.session.request('status', raw=True).transaction_id, 2)
+        self.assertEqual(self.session.sent.raw, True)
+        self.engine.sendall(frame(response(2, 'raw')))
+        self.assertEqual(self.session.read(), response(2, 'raw'))
+
+    def test_discard_cancelled_response(self):
+        properties = []
+        context = self.session.request('context_get', handler=lambda child, document: properties.append(child))
+        self.assertEqual(self.session.cancel(), 1)
+        self.assertRaises(protocol.ProtocolCancelledException, context.result)
+        status = self.session.request('status')
+        self.engine.sendall(frame(response(1, '<property name="$a"/>')) + frame(response(2, status='break')))
+        self.assertEqual(status.result().get('status'), 'break')
+        self.assertEqual(properties, [])
+        self.assertFalse(self.session.transactions)
+
+    def test_discard_unknown_response(self):
+        self.engine.sendall(frame(response(42)))
+        status = self.session.request('status')
+        self.engine.sendall(frame(response(1, status='break')))
+        self.assertEqual(status.result().get('transaction_id'), '1')
+
+    def test_side_effects_are_not_cancelled(self):
+        breakpoint_ids = []
+        breakpoint = self.session.request('breakpoint_set', callback=lambda document: breakpoint_ids.append(document.get('id')))
+        self.assertEqual(self.session.cancel(), 0)
+        self.engine.sendall(frame(response(1, id='42')))
+        breakpoint.result()
+        self.assertEqual(breakpoint_ids, ['42'])
+
+    def test_timeout_keeps_callback(self):
+        set_config(command_timeout={'default': 0.2})
+        breakpoint_ids = []
+        breakpoint = self.session.request('breakpoint_set', callback=lambda document: breakpoint_ids.append(document.get('id')))
+        self.assertRaises(protocol.ProtocolTimeoutException, breakpoint.result)
+        # Late response still keeps track of breakpoint
+        status = self.session.request('status')
+        self.engine.sendall(frame(response(1, id='42')) + frame(response(2)))
+        status.result()
+        self.assertEqual(breakpoint_ids, ['42'])
+
+    def test_timeout_restarts_on_data(self):
+        set_config(command_timeout={'default': 0.3})
+        context = self.session.request('context_get')
+        data = frame(response(1, '<property name="$a"/>' * 20))
+        for offset in range(0, len(data), 40):
+            self.engine.sendall(data[offset:offset + 40])
+            time.sleep(0.05)
+        self.assertEqual(len(context.result()), 20)
+
+    def test_wait(self):
+        run = self.session.request('run')
+        self.assertFalse(run.wait(0.05))
+        self.engine.sendall(frame(response(1, status='break')))
+        self.assertTrue(run.wait(5))
+
+    def test_connection_closed(self):
+        context = self.session.request('context_get')
+        self.engine.close()
+        self.assertRaises(protocol.ProtocolConnectionException, context.result)
+        self.assertRaises(protocol.ProtocolConnectionException, self.session.send, 'status')
+
+    def test_invalid_length(self):
+        context = self.session.request('context_get')
+        self.engine.sendall(b'12a\x00<response/>\x00')
+        self.assertRaises(protocol.ProtocolException, context.result)
+
+    def test_invalid_response(self):
+        context = self.session.request('context_get')
+        status = self.session.request('status')
+        self.engine.sendall(frame('<response transaction_id="1"><property></response>') + frame(response(2)))
+        self.assertRaises(Exception, context.result)
+        self.assertEqual(status.result().get('transaction_id'), '2')
+
+    def test_spilled_response(self):
+        value = 'x' * 5000
+        context = self.session.request('context_get', raw=True)
+        property_get = self.session.request('property_get')
+        self.engine.sendall(frame(response(1, value)) + frame(response(2, '<property>%s</property>' % value)))
+        self.assertEqual(context.result(), response(1, value))
+        self.assertEqual(property_get.result()[0].text, value)
+
+
+class RecordingTestCase(unittest.TestCase):
+    def setUp(self):
+        set_config()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'session.dbgp.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        S.CONFIG = None
+
+    def test_round_trip(self):
+        recorder = Recorder(self.path)
+        recorder.record(RECORD_RECEIVED, [b'<init/>'], 7)
+        recorder.record(RECORD_SENT, [b'run ', b'-i 1'], 8)
+        recorder.record(RECORD_RECEIVED, [b'<response\n', b'/>'], 12)
+        recorder.close()
+        records = list(read_recording(self.path))
+        self.assertEqual([(direction, data) for (direction, timestamp, data) in records], [(RECORD_RECEIVED, b'<init/>'), (RECORD_SENT, b'run -i 1'), (RECORD_RECEIVED, b'<response\n/>')])
+        self.assertEqual([timestamp for (direction, timestamp, data) in records], sorted(timestamp for (direction, timestamp, data) in records))
+
+    def test_truncated(self):
+        recorder = Recorder(self.path)
+        recorder.record(RECORD_RECEIVED, [b'<init/>'], 8)
+        recorder.close()
+        self.assertRaises(ValueError, list, read_recording(self.path))
+
+    def test_record_session(self):
+        loop = protocol.EventLoop()
+        loop.start()
+        engine, connection = socket.socketpair()
+        session = protocol.Protocol()
+        session.recorder = Recorder(self.path)
+        session.attach(connection, loop)
+        try:
+            engine.sendall(frame('<init/>'))
+            session.read()
+            status = session.request('status')
+            engine.sendall(frame(response(1)))
+            status.result()
+        finally:
+            session.clear()
+            engine.close()
+            loop.stop()
+        self.assertEqual([(direction, data) for (direction, timestamp, data) in read_recording(self.path)], [
+            (RECORD_RECEIVED, b'<init/>'),
+            (RECORD_SENT, b'status -i 1'),
+            (RECORD_RECEIVED, response(1).encode('utf8'))
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,9 +7,44 @@ except:
     import settings as S
 
 
-def load_project_values():
+class Config(object):
+    """
+    Immutable snapshot of package/project configuration settings for a window.
+
+    Configuration keys are available as attributes, which allows frequently
+    called functions to read values without accessing the Sublime Text API.
+    """
+    def __init__(self, package=None, project=None):
+        values = {}
+        for key in S.CONFIG_KEYS:
+            value = None
+            # Project value takes precedence over package value
+            if project and key in project:
+                value = project[key]
+            if value is None and package and key in package:
+                value = package[key]
+            values[key] = value
+        self.__dict__.update(values)
+        self.__dict__['_values'] = values
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Configuration snapshot can not be modified')
+
+    def __delattr__(self, name):
+        raise AttributeError('Configuration snapshot can not be modified')
+
+    def get(self, key, default_value=None):
+        value = self._values.get(key)
+        if value is not None:
+            return value
+        return default_value
+
+
+def load_project_values(window=None):
     try:
-        settings = sublime.active_window().active_view().settings()
+        if window is None:
+            window = sublime.active_window()
+        settings = window.active_view().settings()
         # Use 'xdebug' as key which contains dictionary with project values for package
         S.CONFIG_PROJECT = settings.get(S.KEY_XDEBUG)
     except:
@@ -33,20 +68,77 @@ def load_package_values():
     S.CONFIG_PACKAGE = config
 
 
+def get_window_id(window=None):
+    try:
+        if window is None:
+            window = sublime.active_window()
+        return window.id()
+    except:
+        return None
+
+
+def load_config(window=None):
+    """
+    Create configuration snapshot for window and make it the active configuration.
+    """
+    if S.CONFIG_PACKAGE is None:
+        load_package_values()
+    load_project_values(window)
+    config = Config(S.CONFIG_PACKAGE, S.CONFIG_PROJECT)
+    window_id = get_window_id(window)
+    if window_id is not None:
+        S.CONFIG_WINDOW[window_id] = config
+    S.CONFIG = config
+    return config
+
+
+def activate_config(window=None):
+    """
+    Use configuration snapshot of window, which is created when not available.
+    """
+    window_id = get_window_id(window)
+    if window_id is not None and window_id in S.CONFIG_WINDOW:
+        S.CONFIG = S.CONFIG_WINDOW[window_id]
+        return S.CONFIG
+    return load_config(window)
+
+
+def reload_config():
+    """
+    Discard configuration snapshots, should be called when package/project settings have been changed.
+    """
+    S.CONFIG_WINDOW = {}
+    load_package_values()
+    return load_config()
+
+
+def watch_config():
+    """
+    Reload configuration when package settings have been changed.
+    """
+    try:
+        settings = sublime.load_settings(S.FILE_PACKAGE_SETTINGS)
+        settings.clear_on_change(S.KEY_XDEBUG)
+        settings.add_on_change(S.KEY_XDEBUG, reload_config)
+    except:
+        pass
+
+
+def get_config():
+    """
+    Get configuration snapshot of active window.
+    """
+    config = S.CONFIG
+    if config is None:
+        config = load_config()
+    return config
+
+
 def get_value(key, default_value=None):
     """
     Get value from package/project configuration settings.
     """
-    # Get value from project configuration
-    value = get_project_value(key)
-    # Use package configuration when value has not been found
-    if value is None:
-        value = get_package_value(key)
-    # Return package/project value
-    if value is not None:
-        return value
-    # Otherwise use default value
-    return default_value
+    return get_config().get(key, default_value)
 
 
 def get_package_value(key, default_value=None):
@@ -111,9 +203,10 @@ def set_package_value(key, value=None):
         if value is not None:
             config.set(key, value)
         elif config and config.has(key):
-            return config.erase(key)
+            config.erase(key)
     except:
         pass
+    reload_config()
 
 
 def set_project_value(key, value=None):
@@ -140,6 +233,7 @@ def set_project_value(key, value=None):
         del project[S.KEY_SETTINGS][S.KEY_XDEBUG][key]
     # Save project data
     sublime.active_window().set_project_data(project)
+    reload_config()
     return True
 
 
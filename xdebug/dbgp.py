@@ -38,6 +38,9 @@ STEP_OUT = 'step_out'
 STOP = 'stop'
 DETACH = 'detach'
 
+# Commands which continue execution of script until it breaks
+CONTINUATION_COMMANDS = [RUN, STEP_INTO, STEP_OVER, STEP_OUT]
+
 """
 Breakpoint commands
 """
@@ -47,6 +50,14 @@ BREAKPOINT_UPDATE = 'breakpoint_update'
 BREAKPOINT_REMOVE = 'breakpoint_remove'
 BREAKPOINT_LIST = 'breakpoint_list'
 
+"""
+Breakpoint hit conditions
+"""
+HIT_CONDITION_GREATER_OR_EQUAL = '>='
+HIT_CONDITION_EQUAL = '=='
+HIT_CONDITION_MULTIPLE = '%'
+HIT_CONDITIONS = [HIT_CONDITION_GREATER_OR_EQUAL, HIT_CONDITION_EQUAL, HIT_CONDITION_MULTIPLE]
+
 """
 Context/Stack/Property commands
 """
@@ -97,6 +108,8 @@ REASON_EXCEPTION = 'exception'
 """
 Response attributes/elements
 """
+ATTRIBUTE_COMMAND = 'command'
+ATTRIBUTE_TRANSACTION_ID = 'transaction_id'
 ATTRIBUTE_STATUS = 'status'
 ATTRIBUTE_REASON = 'reason'
 ATTRIBUTE_SUCCESS = 'success'
@@ -7,6 +7,7 @@ Helper module for Python version 3.0 and above
 """
 
 import base64
+import sys
 from urllib.parse import unquote, quote
 from collections import OrderedDict
 
@@ -35,9 +36,9 @@ def dictionary_values(dictionary):
     return list(dictionary.values())
 
 
-def data_read(data):
+def data_read(data, errors='strict'):
     # Convert bytes to string
-    return data.decode('utf8')
+    return data.decode('utf8', errors)
 
 
 def data_write(data):
@@ -71,3 +72,10 @@ def is_digit(string):
 
 def is_number(value):
     return isinstance(value, int)
+
+
+def intern_string(string):
+    # Share single instance of frequently repeated strings
+    if isinstance(string, str):
+        return sys.intern(string)
+    return string
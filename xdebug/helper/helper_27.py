@@ -35,8 +35,10 @@ def dictionary_values(dictionary):
     return list(dictionary.values())
 
 
-def data_read(data):
-    # Data for reading/receiving already a string in version 2.*
+def data_read(data, errors='strict'):
+    # Data for reading/receiving already a string in version 2.*, unless received as bytearray
+    if isinstance(data, bytearray):
+        return str(data)
     return data
 
 
@@ -70,3 +72,10 @@ def is_digit(string):
 
 def is_number(value):
     return isinstance(value, (int, long))  # noqa: F821
+
+
+def intern_string(string):
+    # Only byte strings can be interned in version 2.*
+    if isinstance(string, str):
+        return intern(string)  # noqa: F821
+    return string
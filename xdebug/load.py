@@ -12,7 +12,7 @@ except:
 from .view import DATA_BREAKPOINT, DATA_CONTEXT, DATA_STACK, DATA_WATCH, TITLE_WINDOW_BREAKPOINT, TITLE_WINDOW_CONTEXT, TITLE_WINDOW_STACK, TITLE_WINDOW_WATCH, has_debug_view, render_regions, show_content
 from .util import load_breakpoint_data, load_watch_data
 from .log import clear_output, debug, info
-from .config import get_window_value, set_window_value, load_package_values, load_project_values
+from .config import get_window_value, set_window_value, reload_config, watch_config
 
 
 def xdebug():
@@ -23,8 +23,8 @@ def xdebug():
     info('==== Loading "%s" package ====' % S.PACKAGE_FOLDER)
 
     # Load config in package/project configuration
-    load_package_values()
-    load_project_values()
+    reload_config()
+    watch_config()
 
     # Load breakpoint data
     try:
@@ -10,7 +10,7 @@ except:
     import settings as S
 
 # Config module
-from .config import get_value
+from .config import get_config
 
 
 def clear_output():
@@ -20,7 +20,7 @@ def clear_output():
 
 
 def debug(message=None):
-    if not get_value(S.KEY_DEBUG) or message is None:
+    if message is None or not get_config().debug:
         return
     # Write message to output file
     logging.debug(message)
@@ -1,7 +1,16 @@
+import codecs
+import collections
 import errno
+import heapq
+import itertools
+import mmap
 import re
+import select
 import socket
 import sys
+import tempfile
+import threading
+import time
 
 # Helper module
 try:
@@ -15,12 +24,21 @@ try:
 except:
     import settings as S
 
+# DBGp protocol constants
+try:
+    from . import dbgp
+except:
+    import dbgp
+
 # Config module
-from .config import get_value
+from .config import get_config, get_value
 
 # Log module
 from .log import debug
 
+# Recording of messages
+from .replay import RECORD_RECEIVED, RECORD_SENT
+
 # HTML entities
 try:
     from html.entities import name2codepoint
@@ -56,13 +74,547 @@ ILLEGAL_XML_UNICODE_CHARACTERS = [
     (0xDFFFE, 0xDFFFF), (0xEFFFE, 0xEFFFF), (0xFFFFE, 0xFFFFF),
     (0x10FFFE, 0x10FFFF)]
 
-ILLEGAL_XML_RANGES = [
-    '%s-%s' % (H.unicode_chr(low), H.unicode_chr(high))
+# Translation table which replaces invalid XML characters with a question mark
+ILLEGAL_XML_TRANSLATION = dict(
+    (codepoint, H.unicode_string('?'))
     for (low, high) in ILLEGAL_XML_UNICODE_CHARACTERS
     if low < sys.maxunicode
-]
+    for codepoint in range(low, min(high, sys.maxunicode) + 1)
+)
+
+# Characters which are always valid in XML, other characters are looked up in translation table
+VALID_XML_CHARACTERS = H.unicode_string('\t\n\r -~%s-%s') % (H.unicode_chr(0xA0), H.unicode_chr(0xD7FF))
+
+# Matches character which might be invalid in XML
+SUSPECT_XML_RE = re.compile(H.unicode_string('[^%s]') % VALID_XML_CHARACTERS)
+
+# Matches entity/character reference or sequence of characters which might be invalid in XML
+SANITIZE_XML_RE = re.compile(H.unicode_string('&#?\\w+;|[^%s]+') % VALID_XML_CHARACTERS)
+
+# Characters of named entities, except for those which are not needed to be converted for XML
+ENTITY_CHARACTERS = dict(
+    ('&%s;' % name, H.unicode_chr(codepoint))
+    for (name, codepoint) in name2codepoint.items()
+    if name not in ('amp', 'apos', 'gt', 'lt', 'quot')
+)
+
+# Sanitized entity/character references, which are cached as responses tend to repeat the same references
+SANITIZED_REFERENCES = {}
+
+# Maximum number of cached references
+SANITIZED_REFERENCES_SIZE = 4096
+
+
+def convert_reference(text):
+    """
+    Convert entity/character reference to ordinary character, returns reference itself when it is not converted.
+    """
+    # Character reference
+    if text[:2] == '&#':
+        try:
+            if text[:3] == '&#x':
+                return H.unicode_chr(int(text[3:-1], 16))
+            else:
+                return H.unicode_chr(int(text[2:-1]))
+        except (ValueError, OverflowError):
+            return text
+    # Named entity
+    return ENTITY_CHARACTERS.get(text, text)
+
+
+def sanitize_data(data, unescape=True):
+    """
+    Make decoded response data suitable for XML parser in a single pass,
+    converting entity/character references and replacing invalid XML characters.
+
+    Keyword arguments:
+    data -- Decoded response data.
+    unescape -- Convert entity/character references to ordinary characters.
+    """
+    if not unescape or '&' not in data:
+        # Plain ASCII data only needs its control characters replaced
+        if hasattr(data, 'isascii') and data.isascii():
+            return data.translate(ILLEGAL_XML_TRANSLATION)
+        # Most responses do not contain any characters which might be invalid
+        if SUSPECT_XML_RE.search(data) is None:
+            return data
+        return data.translate(ILLEGAL_XML_TRANSLATION)
+
+    def convert(matches):
+        text = matches.group(0)
+        if text[0] != '&':
+            return text.translate(ILLEGAL_XML_TRANSLATION)
+        sanitized = SANITIZED_REFERENCES.get(text)
+        if sanitized is None:
+            # Converted character might be invalid as well
+            sanitized = convert_reference(text).translate(ILLEGAL_XML_TRANSLATION)
+            if len(SANITIZED_REFERENCES) < SANITIZED_REFERENCES_SIZE:
+                SANITIZED_REFERENCES[text] = sanitized
+        return sanitized
+    return SANITIZE_XML_RE.sub(convert, data)
+
+
+# Receive data directly into preallocated buffer, unavailable in Python 2.6
+try:
+    memoryview
+except NameError:
+    memoryview = None
+
+
+class SpilledFrame(object):
+    """
+    Data of message which is too large to keep in memory, stored in a temporary file while it is being received
+    and read back from a memory map once it is complete.
+    """
+
+    def __init__(self, size):
+        """
+        Keyword arguments:
+        size -- Length of frame, including trailing NULL byte.
+        """
+        self.file = tempfile.TemporaryFile()
+        self.size = size
+        self.map = None
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        # Trailing NULL byte is part of memory map, but not of data
+        if isinstance(index, slice):
+            index = slice(*index.indices(self.size))
+        return self.map[index]
+
+    def write(self, data):
+        self.file.write(data)
+
+    def complete(self):
+        """
+        Map stored data into memory, excluding trailing NULL byte from length of frame.
+        Returns False when data is not terminated by a NULL byte.
+        """
+        self.file.flush()
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size -= 1
+        return self.map[self.size:self.size + 1] == b'\x00'
+
+    def close(self):
+        """
+        Release memory map and remove temporary file.
+        """
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+
+# Names of error handlers for decoding response data, by encoding which is used for invalid UTF-8 data
+DECODING_ERRORS = {}
+
+
+def get_decoding_errors(encoding=None):
+    """
+    Get name of error handler for decoding response data as UTF-8, so invalid data never fails decoding.
+
+    Debugger engines might report a different encoding than the one of their data (Xdebug reports iso-8859-1,
+    while sending strings as they are stored by PHP), so data is decoded as UTF-8 and only data which is not
+    valid UTF-8 is decoded by the encoding which has been negotiated, otherwise it is replaced.
+
+    Keyword arguments:
+    encoding -- Encoding which has been negotiated with debugger engine.
+    """
+    try:
+        name = codecs.lookup(encoding).name if encoding else 'utf-8'
+    except LookupError:
+        name = 'utf-8'
+    if name in ('utf-8', 'utf8'):
+        return 'replace'
+    if name not in DECODING_ERRORS:
+        def decode_invalid(error):
+            if not isinstance(error, UnicodeDecodeError):
+                raise error
+            return (bytes(error.object[error.start:error.end]).decode(name, 'replace'), error.end)
+        DECODING_ERRORS[name] = 'xdebug-%s' % name
+        codecs.register_error(DECODING_ERRORS[name], decode_invalid)
+    return DECODING_ERRORS[name]
+
+
+def iterate_frame(frame, size=65536):
+    """
+    Iterate over data of message in parts, so no copy of all data is needed to decode and parse it.
+    """
+    for offset in range(0, len(frame), size):
+        yield frame[offset:offset + size]
+
+
+def frame_data(frame, errors='replace'):
+    """
+    Get data of message as string, releasing temporary file of spilled frame.
+
+    Keyword arguments:
+    frame -- Data of message.
+    errors -- Error handler for data which is not valid UTF-8.
+    """
+    if isinstance(frame, SpilledFrame):
+        try:
+            return H.data_read(frame[:len(frame)], errors)
+        finally:
+            frame.close()
+    return H.data_read(frame, errors)
+
+
+def close_frame(frame):
+    """
+    Release temporary file of spilled frame.
+    """
+    if isinstance(frame, SpilledFrame):
+        frame.close()
+
+
+class FrameReader(object):
+    """
+    Reader for messages from debugger engine, which are framed by DBGp protocol as followed:
+    length of data, NULL byte, data (XML document), NULL byte.
+    """
+
+    # Minimum/maximum amount of data to be received at once by socket
+    min_read_size = 1024
+    max_read_size = 65536
+
+    def __init__(self, spill_size=None, consumer=None):
+        """
+        Keyword arguments:
+        spill_size -- Length of data above which frame is stored in a temporary file instead of memory.
+        consumer -- Function which receives data of each frame in parts while it is being received.
+        """
+        self.spill_size = spill_size
+        self.consumer = consumer
+        self.frame = None
+        self.clear()
+
+    def clear(self):
+        """
+        Discard any received data and reset amount of data to receive at once.
+        """
+        close_frame(self.frame)
+        # Received data which has not been consumed by a frame yet
+        self.buffer = bytearray()
+        # Preallocated frame for data of message, including trailing NULL byte
+        self.frame = None
+        self.offset = 0
+        self.read_size = self.min_read_size
+        # Length of data of frame which has been passed to consumer
+        self.consumed = 0
 
-ILLEGAL_XML_RE = re.compile(H.unicode_string('[%s]') % H.unicode_string('').join(ILLEGAL_XML_RANGES))
+    def consume(self, data=None):
+        """
+        Pass received data of frame, excluding trailing NULL byte, to consumer.
+
+        Keyword arguments:
+        data -- Data which has just been written to spilled frame, as it can not be sliced before it is complete.
+        """
+        if self.consumer is None or self.frame is None:
+            return
+        end = min(self.offset, len(self.frame) - 1)
+        if end > self.consumed:
+            if data is not None:
+                self.consumer(data[:len(data) - (self.offset - end)])
+            else:
+                self.consumer(self.frame[self.consumed:end])
+            self.consumed = end
+
+    def write(self, data):
+        """
+        Write received data into spilled frame.
+        """
+        self.frame.write(data)
+        self.offset += len(data)
+        self.consume(data)
+
+    def next_frame(self):
+        """
+        Return data of message when a complete frame has been received, otherwise None.
+        """
+        # Parse length of data, which is followed by a NULL byte
+        if self.frame is None:
+            position = self.buffer.find(b'\x00')
+            if position == -1:
+                return None
+            length = bytes(self.buffer[:position])
+            if not length.isdigit():
+                raise ProtocolException('Invalid length encountered while reading the Xdebug message')
+            # Store large message in temporary file instead of memory
+            if self.spill_size and int(length) > self.spill_size:
+                self.frame = SpilledFrame(int(length) + 1)
+            else:
+                self.frame = bytearray(int(length) + 1)
+            self.offset = 0
+            self.consumed = 0
+            del self.buffer[:position + 1]
+
+        # Move remaining received data into frame
+        if self.buffer and self.offset < len(self.frame):
+            size = min(len(self.buffer), len(self.frame) - self.offset)
+            if isinstance(self.frame, SpilledFrame):
+                self.write(bytes(self.buffer[:size]))
+            else:
+                self.frame[self.offset:self.offset + size] = self.buffer[:size]
+                self.offset += size
+                self.consume()
+            del self.buffer[:size]
+
+        # Frame is incomplete
+        if self.offset < len(self.frame):
+            return None
+
+        # Verify length of data by trailing NULL byte
+        frame = self.frame
+        self.frame = None
+        self.offset = 0
+        if isinstance(frame, SpilledFrame):
+            if not frame.complete():
+                frame.close()
+                raise ProtocolException('Length mismatch encountered while reading the Xdebug message')
+            return frame
+        if frame[-1] != 0:
+            raise ProtocolException('Length mismatch encountered while reading the Xdebug message')
+        del frame[-1]
+        return frame
+
+    def receive(self, sock):
+        """
+        Receive available data from socket, returns amount of received bytes.
+        """
+        # Receive remaining data of spilled frame in parts
+        if isinstance(self.frame, SpilledFrame):
+            data = sock.recv(min(len(self.frame) - self.offset, self.max_read_size))
+            size = len(data)
+            self.write(data)
+        # Receive remaining data of frame directly into preallocated buffer
+        elif self.frame is not None and memoryview is not None:
+            size = sock.recv_into(memoryview(self.frame)[self.offset:])
+            self.offset += size
+            self.consume()
+        # Otherwise receive data which contains length (and start) of next frame
+        else:
+            data = sock.recv(self.read_size)
+            size = len(data)
+            self.buffer.extend(data)
+            # Adapt amount of data to receive at once to size of responses
+            if size >= self.read_size:
+                self.read_size = min(self.read_size * 2, self.max_read_size)
+            elif size < self.read_size // 4:
+                self.read_size = max(self.read_size // 2, self.min_read_size)
+        if not size:
+            raise ProtocolConnectionException('Connection closed by debugger engine')
+        return size
+
+
+class ResponseTreeBuilder(object):
+    """
+    Target for XML parser which builds response document and hands over
+    each top-level element of response as soon as it has been parsed.
+    Elements which have been handled are removed from response document, so it does not grow with response data.
+    """
+
+    def __init__(self, handler=None):
+        self.builder = ET.TreeBuilder()
+        self.handler = handler
+        self.depth = 0
+        self.root = None
+
+    def start(self, tag, attrib):
+        self.depth += 1
+        element = self.builder.start(tag, attrib)
+        if self.depth == 1:
+            self.root = element
+        return element
+
+    def end(self, tag):
+        element = self.builder.end(tag)
+        self.depth -= 1
+        if self.depth == 1 and self.handler is not None and self.handler(element, self.root):
+            self.root.remove(element)
+        return element
+
+    def data(self, data):
+        self.builder.data(data)
+
+    def close(self):
+        return self.builder.close()
+
+
+class ResponseParser(object):
+    """
+    Incremental parser for response data, which is fed while data is being received from debugger engine.
+    """
+
+    # Maximum length of entity/character reference which can be split between parts of data
+    max_reference_length = 32
+
+    def __init__(self, sanitize, handler=None, errors='replace'):
+        """
+        Keyword arguments:
+        sanitize -- Function which makes decoded response data suitable for XML parser.
+        handler -- Function which is called with each top-level element and response document,
+                   returns True when element has been handled and can be removed from response document.
+        errors -- Error handler for data which is not valid UTF-8, characters split between parts are decoded as a whole.
+        """
+        self.sanitize = sanitize
+        self.decoder = codecs.getincrementaldecoder('utf8')(errors)
+        self.pending = H.unicode_string('')
+        self.target = ResponseTreeBuilder(handler)
+        # Data is fed as UTF-8, regardless of encoding in XML declaration of response
+        try:
+            self.parser = ET.XMLParser(target=self.target, encoding='utf-8')
+        except TypeError:
+            self.parser = ET.XMLParser(target=self.target)
+        # Exception raised while parsing, which is postponed until all data has been received
+        self.error = None
+
+    def feed(self, data, final=False):
+        """
+        Decode, sanitize and parse part of response data.
+        """
+        if self.error is not None:
+            return
+        try:
+            text = self.pending + self.decoder.decode(data, final)
+            self.pending = H.unicode_string('')
+            # Hold back entity/character reference which might continue in next part of data
+            if not final:
+                position = text.rfind('&', -self.max_reference_length)
+                if position != -1 and ';' not in text[position:]:
+                    text, self.pending = text[:position], text[position:]
+            text = self.sanitize(text)
+            # Parser expects encoded data in Python 2
+            if not isinstance(text, str):
+                text = text.encode('utf8')
+            if text:
+                self.parser.feed(text)
+        except:
+            self.error = sys.exc_info()[1]
+
+    def close(self):
+        """
+        Parse remaining response data and return XML document object.
+        """
+        self.feed(b'', True)
+        if self.error is not None:
+            raise self.error
+        return self.parser.close()
+
+
+# Commands which continue or end execution of script
+CONTINUING_COMMANDS = dbgp.CONTINUATION_COMMANDS + [dbgp.STOP, dbgp.DETACH]
+
+# Commands which only retrieve data, of which response can be discarded when it is no longer needed.
+# Callbacks of other commands keep track of state in debugger engine, and are called even when response is late.
+CANCELLABLE_COMMANDS = [dbgp.CONTEXT_GET, dbgp.PROPERTY_GET, dbgp.STACK_GET, dbgp.EVAL]
+
+
+def get_command_timeout(command):
+    """
+    Get configured number of seconds to wait for response of command, returns None when there is no timeout.
+    Continuation commands have no timeout by default, as script might run for a long time.
+    """
+    command_timeout = get_value(S.KEY_COMMAND_TIMEOUT)
+    if not isinstance(command_timeout, dict):
+        return None
+    if command in command_timeout:
+        timeout = command_timeout[command]
+    elif command in dbgp.CONTINUATION_COMMANDS:
+        return None
+    else:
+        timeout = command_timeout.get('default')
+    if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+        return None
+    return timeout
+
+
+def set_keepalive(sock):
+    """
+    Enable TCP keepalive on socket, so a debugger engine which is no longer reachable is detected within a minute.
+    """
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # Idle time, interval and number of probes (in seconds) before connection is considered dead
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30)
+        elif hasattr(socket, 'TCP_KEEPALIVE'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, 30)
+        if hasattr(socket, 'TCP_KEEPINTVL'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)
+        if hasattr(socket, 'TCP_KEEPCNT'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+        if hasattr(socket, 'SIO_KEEPALIVE_VALS'):
+            sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, 30000, 10000))
+    except:
+        e = sys.exc_info()[1]
+        debug('Failed to enable keepalive on socket: %s' % e)
+
+
+class Transaction(object):
+    """
+    Command which has been sent to debugger engine and is awaiting its response.
+    """
+
+    def __init__(self, protocol, transaction_id, command, handler=None, callback=None, raw=False):
+        """
+        Keyword arguments:
+        protocol -- Connection with debugger engine to which command has been sent.
+        transaction_id -- Unique numerical ID of command.
+        command -- Name of command.
+        handler -- Function which is called (in event loop) with each top-level element and response document.
+        callback -- Function which is called (in event loop) with response document when it has been received.
+        raw -- Keep response data as string instead of XML document object.
+        """
+        self.protocol = protocol
+        self.transaction_id = transaction_id
+        self.command = command
+        self.handler = handler
+        self.callback = callback
+        self.raw = raw
+        self.response = None
+        self.error = None
+        self.done = False
+        # Response is discarded when command has been cancelled
+        self.cancelled = False
+        # Number of seconds in which response data should start or continue to be received
+        self.timeout = get_command_timeout(command)
+        self.started = time.time()
+        self.expired = False
+        # Timer of event loop which expires transaction
+        self.timer = None
+
+    def result(self):
+        """
+        Wait until response has been received from debugger engine and return it.
+        Raises ProtocolTimeoutException when response has not been received within timeout of command,
+        or ProtocolCancelledException when command has been cancelled.
+        """
+        self.protocol.wait(self)
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+    def wait(self, timeout=None):
+        """
+        Wait until response has been received from debugger engine, returns False when timeout (in seconds) has expired.
+        """
+        return self.protocol.wait(self, timeout)
+
+    def cancel(self):
+        """
+        Stop waiting for response of command, response is discarded when it is received.
+        """
+        self.cancelled = True
+
+    def is_cancellable(self):
+        """
+        Check if response of command can be discarded, as command has no side effects in debugger engine.
+        """
+        return self.command in CANCELLABLE_COMMANDS
 
 
 class Protocol(object):
@@ -70,14 +622,36 @@ class Protocol(object):
     Class for connecting with debugger engine which uses DBGp protocol.
     """
 
-    # Maximum amount of data to be received at once by socket
-    read_size = 1024
-
     def __init__(self):
         # Set host address to listen for response
         self.host = get_value(S.KEY_HOST, S.DEFAULT_HOST)
         # Set port number to listen for response
         self.port = get_value(S.KEY_PORT, S.DEFAULT_PORT)
+        # Reader for framed messages from debugger engine
+        self.reader = FrameReader()
+        # Worker which handles actions for session (assigned by session module)
+        self.worker = None
+        # Initialization response of debugger engine, when received before session is being debugged
+        self.init = None
+        # Session state, stored while another session is being debugged (assigned by session module)
+        self.state = None
+        # Event loop which receives data from socket
+        self.loop = None
+        # Messages which are not a response of a command and have not been read yet
+        self.received = collections.deque()
+        self.received_condition = threading.Condition()
+        # Function which is called (in event loop) when messages have been received
+        self.received_callback = None
+        # Transaction of command which has been sent last
+        self.sent = None
+        # Parser of response data which is being received
+        self.parser = None
+        # Exception which made connection unusable, commands fail with it
+        self.error = None
+        # Time when data has been received last, which restarts timeout of commands
+        self.activity = 0
+        # Recorder of sent and received messages, when session is being recorded (assigned by session module)
+        self.recorder = None
         self.clear()
 
     def transaction_id():
@@ -102,7 +676,22 @@ class Protocol(object):
         """
         Clear variables, reset transaction_id, close socket connection.
         """
-        self.buffer = ''
+        # Stop receiving data by event loop and fail commands which are waiting for response
+        if self.loop is not None:
+            self.stop_receiving()
+            self.loop = None
+            self.received_callback = None
+            self.fail(ProtocolConnectionException('Xdebug is not connected'))
+        self.reader.clear()
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        # Transactions awaiting their response, by transaction ID
+        self.transactions = H.new_dictionary()
+        self.sent = None
+        self.parser = None
+        # Encoding which has been negotiated with debugger engine
+        self.set_encoding(None)
         self.connected = False
         self.listening = False
         del self.transaction_id
@@ -112,93 +701,101 @@ class Protocol(object):
             pass
         self.socket = None
 
-    def unescape(self, string):
+    def record(self, direction, frame):
         """
-        Convert HTML entities and character references to ordinary characters.
+        Write message to recording of session, recording is stopped when it fails.
+
+        Keyword arguments:
+        direction -- Whether message has been sent (RECORD_SENT) or received (RECORD_RECEIVED).
+        frame -- Data of message.
         """
-        def convert(matches):
-            text = matches.group(0)
-            # Character reference
-            if text[:2] == '&#':
-                try:
-                    if text[:3] == '&#x':
-                        return H.unicode_chr(int(text[3:-1], 16))
-                    else:
-                        return H.unicode_chr(int(text[2:-1]))
-                except ValueError:
-                    pass
-            # Named entity
-            else:
-                try:
-                    # Following are not needed to be converted for XML
-                    if text[1:-1] in ('amp', 'apos', 'gt', 'lt', 'quot'):
-                        pass
-                    else:
-                        text = H.unicode_chr(name2codepoint[text[1:-1]])
-                except KeyError:
-                    pass
-            return text
-        return re.sub(r'&#?\w+;', convert, string)
+        recorder = self.recorder
+        if recorder is None:
+            return
+        try:
+            recorder.record(direction, iterate_frame(frame), len(frame))
+        except:
+            e = sys.exc_info()[1]
+            debug('Failed to record message, stopped recording %s: %s' % (recorder.path, e))
+            self.recorder = None
+            recorder.close()
 
-    def read_until_null(self):
+    def set_encoding(self, encoding):
         """
-        Get response data from debugger engine.
+        Use encoding which has been negotiated with debugger engine for response data which is not valid UTF-8.
         """
-        # Check socket connection
-        if self.connected:
-            # Get result data from debugger engine
-            try:
-                while '\x00' not in self.buffer:
-                    self.buffer += H.data_read(self.socket.recv(self.read_size))
-                data, self.buffer = self.buffer.split('\x00', 1)
-                return data
-            except:
-                e = sys.exc_info()[1]
-                raise ProtocolConnectionException(e)
-        else:
-            raise ProtocolConnectionException('Xdebug is not connected')
+        self.encoding = encoding
+        self.decoding_errors = get_decoding_errors(encoding)
 
-    def read_data(self):
+    def read(self):
         """
-        Get response data from debugger engine and verify length of response.
+        Get response of command which has been sent last as XML document object,
+        or next message which is not a response to a command (initialization of debugger engine) when no command has been sent.
         """
-        # Verify length of response data
-        length = self.read_until_null()
-        message = self.read_until_null()
-        if int(length) == len(message):
-            return message
-        else:
-            raise ProtocolException('Length mismatch encountered while reading the Xdebug message')
+        if self.sent is None:
+            return self.next_received()
+        return self.sent.result()
 
-    def read(self, return_string=False):
+    def pending(self):
         """
-        Get response from debugger engine as XML document object.
+        Get transactions of commands which are still waiting for their response.
         """
-        # Get result data from debugger engine and verify length of response
-        data = self.read_data()
+        with self.received_condition:
+            return [transaction for transaction in self.transactions.values() if not transaction.done and not transaction.cancelled]
 
-        # Show debug output
-        debug('[Response data] %s' % data)
-
-        # Return data string
-        if return_string:
-            return data
+    def is_continuing(self):
+        """
+        Check if a command which continues (or ends) execution of script is waiting for its response.
+        """
+        return any(transaction.command in CONTINUING_COMMANDS for transaction in self.pending())
 
-        # Remove special character quoting
-        if UNESCAPE_RESPONSE_DATA:
-            data = self.unescape(data)
+    def cancel(self):
+        """
+        Cancel commands which retrieve data and are waiting for their response, returns number of cancelled commands.
+        Responses of cancelled commands are discarded when received, in order to keep responses in sequence.
+        Commands with side effects are never cancelled, as their callbacks keep track of state in debugger engine.
+        """
+        cancelled = 0
+        for transaction in self.pending():
+            if transaction.is_cancellable():
+                transaction.cancel()
+                cancelled += 1
+        # Wake up thread which is waiting for response
+        with self.received_condition:
+            self.received_condition.notify_all()
+        return cancelled
 
-        # Replace invalid XML characters
-        data = ILLEGAL_XML_RE.sub('?', data)
+    def debug_frame(self, frame):
+        """
+        Show debug output of response data, except for data stored in temporary file.
+        """
+        if not get_config().debug:
+            return
+        if isinstance(frame, SpilledFrame):
+            debug('[Response data] %d bytes stored in temporary file' % len(frame))
+        else:
+            debug('[Response data] %s' % H.data_read(frame, self.decoding_errors))
 
-        # Create XML document object
-        document = ET.fromstring(data)
-        return document
+    def sanitize(self, data):
+        """
+        Make response data suitable for XML parser.
+        """
+        # Remove special character quoting and replace invalid XML characters
+        return sanitize_data(data, UNESCAPE_RESPONSE_DATA)
 
     def send(self, command, *args, **kwargs):
         """
-        Send command to the debugger engine according to DBGp protocol.
+        Send command to the debugger engine according to DBGp protocol, returns transaction ID of command.
+
+        Keyword arguments:
+        handler -- Function which is called with each top-level element and response document, as soon as it has been parsed.
+        callback -- Function which is called with response document when it has been received.
+        raw -- Keep response data as string instead of XML document object.
         """
+        handler = kwargs.pop('handler', None)
+        callback = kwargs.pop('callback', None)
+        raw = kwargs.pop('raw', False)
+
         # Expression is used for conditional and watch type breakpoints
         expression = None
 
@@ -226,72 +823,470 @@ class Protocol(object):
         # Show debug output
         debug('[Send command] %s' % command)
 
+        # Register transaction before sending command, as its response might be received by event loop as soon as it is sent
+        transaction = Transaction(self, transaction_id, build_command[0], handler, callback, raw)
+        with self.received_condition:
+            if self.error is not None:
+                raise self.error
+            self.transactions['%i' % transaction_id] = transaction
+        self.sent = transaction
+
+        # Let event loop expire transaction when response has not been received in time
+        if transaction.timeout is not None and self.loop is not None:
+            transaction.timer = self.loop.call_later(transaction.timeout, lambda: self.expire(transaction))
+
         # Send command to debugger engine
+        data = H.data_write(command + '\x00')
+        # Record command before sending it, as its response might be recorded by event loop as soon as it is sent
+        self.record(RECORD_SENT, data[:-1])
         try:
-            self.socket.send(H.data_write(command + '\x00'))
+            self.socket.sendall(data)
         except:
             e = sys.exc_info()[1]
             raise ProtocolConnectionException(e)
+        return transaction_id
 
-    def listen(self):
+    def request(self, command, *args, **kwargs):
         """
-        Create socket server which listens for connection on configured port.
+        Send command to the debugger engine without waiting for its response,
+        which allows sending multiple commands at once. Returns transaction of command.
+        See send() for keyword arguments.
         """
-        # Create socket server
-        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.send(command, *args, **kwargs)
+        return self.sent
 
-        if server:
-            # Configure socket server
+    def attach(self, connection, loop):
+        """
+        Use socket connection, which has been accepted by listener, for communicating with debugger engine.
+
+        Keyword arguments:
+        connection -- Socket of accepted connection.
+        loop -- Event loop which receives data from socket.
+        """
+        self.socket = connection
+        self.socket.settimeout(None)
+        set_keepalive(self.socket)
+        self.reader.spill_size = get_value(S.KEY_MAX_RESPONSE_MEMORY)
+        # Parse response data while it is being received when XML parser is available
+        self.reader.consumer = self.feed if UNESCAPE_RESPONSE_DATA else None
+        self.connected = True
+        self.listening = False
+        self.error = None
+        # Let event loop receive data from socket as soon as it is available
+        self.loop = loop
+        self.received.clear()
+        loop.add_reader(self.socket, self.receive)
+
+    def receive(self):
+        """
+        Receive available data from socket, called by event loop when socket is readable.
+        Responses complete transaction of their command, other messages are stored until they are read.
+        All transactions fail when connection is lost.
+        """
+        received = False
+        try:
+            self.reader.receive(self.socket)
+            self.activity = time.time()
+            frame = self.reader.next_frame()
+            while frame is not None:
+                self.record(RECORD_RECEIVED, frame)
+                received = self.complete(frame) is None or received
+                frame = self.reader.next_frame()
+        except:
+            e = sys.exc_info()[1]
+            self.stop_receiving()
+            self.fail(e if isinstance(e, ProtocolException) else ProtocolConnectionException(e))
+            received = True
+        if received and self.received_callback is not None:
+            self.received_callback()
+
+    def feed(self, data):
+        """
+        Parse part of response data as soon as it has been received, called by frame reader in event loop.
+        """
+        if self.parser is None:
+            self.parser = ResponseParser(self.sanitize, self.route, self.decoding_errors)
+        self.parser.feed(data)
+
+    def route(self, child, response):
+        """
+        Hand over top-level element of response to handler of transaction as soon as it has been parsed,
+        unless transaction has been cancelled. Returns True when element is not kept in response document,
+        as it has been handled or response is discarded.
+        """
+        with self.received_condition:
+            transaction = self.transactions.get(response.get(dbgp.ATTRIBUTE_TRANSACTION_ID))
+        if transaction is None:
+            return False
+        if transaction.handler is not None and not transaction.cancelled:
+            transaction.handler(child, response)
+        return transaction.handler is not None or transaction.cancelled
+
+    def parse(self, frame):
+        """
+        Finish parsing message which has been received completely, returns XML document object.
+        """
+        parser, self.parser = self.parser, None
+        if not UNESCAPE_RESPONSE_DATA:
+            response = ET.fromstring(self.sanitize(frame_data(frame, self.decoding_errors)))
+            for child in list(response):
+                if self.route(child, response):
+                    response.remove(child)
+            return response
+        # Message without data has not been fed to parser
+        if parser is None:
+            parser = ResponseParser(self.sanitize, self.route, self.decoding_errors)
+        try:
+            return parser.close()
+        except:
+            # Response might be matched to its transaction, when its root element has been parsed
+            e = sys.exc_info()[1]
+            e.response = parser.target.root
+            raise e
+
+    def complete(self, frame):
+        """
+        Match message which has been received to transaction of command by its transaction ID and complete transaction.
+        Returns completed transaction, or None when message is not a response of a pending command.
+        """
+        error = None
+        try:
+            response = self.parse(frame)
+        except:
+            error = sys.exc_info()[1]
+            response = getattr(error, 'response', None)
+        transaction_id = response.get(dbgp.ATTRIBUTE_TRANSACTION_ID) if response is not None else None
+
+        with self.received_condition:
+            transaction = self.transactions.pop(transaction_id, None) if transaction_id is not None else None
+            # Debugger engine responds in order of commands, fail oldest transaction on invalid response
+            if transaction is None and error is not None and self.transactions:
+                transaction = self.transactions.pop(min(self.transactions, key=int))
+            # Message which is not a response of a command, such as initialization of debugger engine
+            if transaction is None and transaction_id is None:
+                self.received.append(response if error is None else error)
+                self.received_condition.notify_all()
+        try:
+            if transaction is None:
+                if transaction_id is not None:
+                    debug('Discarding response with unknown transaction ID (%s).' % transaction_id)
+                return None
+            if error is not None:
+                transaction.error = error
+            elif transaction.raw:
+                transaction.response = frame_data(frame, self.decoding_errors)
+            else:
+                transaction.response = response
+            if error is None and transaction.callback is not None and not transaction.cancelled:
+                try:
+                    transaction.callback(response)
+                except:
+                    transaction.error = sys.exc_info()[1]
+                    debug('Exception in callback of command (%s): %s' % (transaction.command, transaction.error))
+            if transaction.timer is not None:
+                self.loop.cancel(transaction.timer)
+            with self.received_condition:
+                transaction.done = True
+                self.received_condition.notify_all()
+            return transaction
+        finally:
+            self.debug_frame(frame)
+            close_frame(frame)
+
+    def stop_receiving(self):
+        """
+        Stop receiving data by event loop, as data of debugger engine can no longer be relied upon.
+        """
+        if self.loop is not None:
+            self.loop.remove_reader(self.socket)
+
+    def fail(self, error):
+        """
+        Fail all commands which are waiting for their response, as connection with debugger engine is unusable.
+        """
+        with self.received_condition:
+            self.error = error
+            for transaction in self.transactions.values():
+                transaction.error = error
+                transaction.done = True
+            self.transactions.clear()
+            self.received_condition.notify_all()
+
+    def next_received(self):
+        """
+        Wait for message which has been received by event loop and is not a response of a command, and return it.
+        Raises exception when connection has been lost.
+        """
+        with self.received_condition:
+            while not self.received:
+                if self.error is not None:
+                    raise self.error
+                self.received_condition.wait()
+            message = self.received.popleft()
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+    def wait(self, transaction, timeout=None):
+        """
+        Wait until response of transaction has been received, returns False when timeout (in seconds) has expired.
+        Raises ProtocolTimeoutException when transaction has expired
+        or ProtocolCancelledException when transaction has been cancelled.
+        """
+        end = time.time() + timeout if timeout is not None else None
+        with self.received_condition:
+            while not transaction.done:
+                if transaction.expired:
+                    raise ProtocolTimeoutException('Debugger engine did not respond to command (%s) in time.' % transaction.command)
+                if transaction.cancelled:
+                    raise ProtocolCancelledException('Command (%s) has been cancelled.' % transaction.command)
+                remaining = None
+                if end is not None:
+                    remaining = end - time.time()
+                    if remaining <= 0:
+                        return False
+                self.received_condition.wait(remaining)
+        return True
+
+    def expire(self, transaction):
+        """
+        Stop waiting for response of transaction when no data has been received within its timeout, called by event loop.
+        """
+        with self.received_condition:
+            if transaction.done or self.loop is None:
+                return
+            # Restart timeout while response data is being received, as large responses take a while
+            remaining = max(transaction.started, self.activity) + transaction.timeout - time.time()
+            if remaining > 0:
+                transaction.timer = self.loop.call_later(remaining, lambda: self.expire(transaction))
+                return
+            transaction.expired = True
+            # Discard response when it is received after all, unless its callback keeps track of state
+            if transaction.is_cancellable():
+                transaction.cancel()
+            self.received_condition.notify_all()
+
+
+def create_socket_pair():
+    """
+    Create pair of connected sockets, socket.socketpair is unavailable on Windows before Python 3.5.
+    """
+    try:
+        return socket.socketpair()
+    except (AttributeError, NotImplementedError, socket.error):
+        pass
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        client = socket.create_connection(server.getsockname())
+        connection, address = server.accept()
+        return connection, client
+    finally:
+        server.close()
+
+
+class EventLoop(object):
+    """
+    Single thread which waits for activity on sockets of listener and sessions at once and runs timers,
+    instead of a blocking thread for each socket.
+    Callbacks are called in thread of event loop and should not wait for responses.
+    """
+
+    def __init__(self):
+        # Functions which are called when socket is readable, by socket
+        self.readers = {}
+        # Heap of timers, which consist of deadline, sequence number and function
+        self.timers = []
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        # Sockets for waking up event loop when readers or timers have changed
+        self.wakeup_receiver, self.wakeup_sender = create_socket_pair()
+
+    def start(self):
+        """
+        Start thread of event loop.
+        """
+        self.running = True
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop thread of event loop, which closes its wakeup sockets when it exits.
+        """
+        self.running = False
+        self.wakeup()
+
+    def wakeup(self):
+        try:
+            self.wakeup_sender.send(b'\x00')
+        except socket.error:
+            pass
+
+    def add_reader(self, sock, callback):
+        """
+        Call function each time data is available on socket.
+        """
+        with self.lock:
+            self.readers[sock] = callback
+        self.wakeup()
+
+    def remove_reader(self, sock):
+        with self.lock:
+            removed = self.readers.pop(sock, None) is not None
+        if removed:
+            self.wakeup()
+
+    def call_later(self, delay, callback):
+        """
+        Call function after delay (in seconds), returns timer which can be cancelled.
+        """
+        timer = [time.time() + delay, next(self.sequence), callback]
+        with self.lock:
+            heapq.heappush(self.timers, timer)
+        self.wakeup()
+        return timer
+
+    def cancel(self, timer):
+        # Cancelled timer remains in heap until its deadline, without function to call
+        timer[2] = None
+
+    def run(self):
+        while self.running:
+            with self.lock:
+                readers = dict(self.readers)
+                timeout = max(0, self.timers[0][0] - time.time()) if self.timers else None
             try:
-                server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                server.settimeout(1)
-                server.bind((self.host, self.port))
-                server.listen(1)
-                self.listening = True
-                self.socket = None
+                readable, writable, exceptional = select.select([self.wakeup_receiver] + list(readers.keys()), [], [], timeout)
+            except (select.error, socket.error, ValueError):
+                # Socket has been closed in the meantime, readers are updated on next iteration
+                continue
+
+            for sock in readable:
+                if sock is self.wakeup_receiver:
+                    self.wakeup_receiver.recv(1024)
+                    continue
+                self.call(readers[sock])
+
+            # Run timers which have expired
+            now = time.time()
+            expired = []
+            with self.lock:
+                while self.timers and self.timers[0][0] <= now:
+                    expired.append(heapq.heappop(self.timers)[2])
+            for callback in expired:
+                if callback is not None:
+                    self.call(callback)
+
+        # Close wakeup sockets, event loop can not be started again
+        with self.lock:
+            self.readers.clear()
+            del self.timers[:]
+        for sock in (self.wakeup_receiver, self.wakeup_sender):
+            try:
+                sock.close()
             except:
-                e = sys.exc_info()[1]
-                debug('Failed to create socket: %s' % e)
-                # Substitute exception with readable (custom) message
-                if isinstance(e, TypeError) and not H.is_number(self.port):
-                    e = 'Configured port is not a valid integer.'
-                elif isinstance(e, socket.gaierror) and self.host != '':
-                    e = 'Hostname (%s) is not specified in hosts file or is an IPv6 address.' % self.host
-                elif hasattr(e, 'errno'):
-                    address_or_port = 'address (%s:%d)' % (self.host, self.port) if self.host != '' else 'port (%d)' % self.port
-                    if e.errno == errno.EADDRINUSE:
-                        e = 'Another application is already listening on configured %s.' % address_or_port
-                    elif e.errno == errno.EADDRNOTAVAIL:
-                        e = 'Configured %s is not accessible.' % address_or_port
-                raise ProtocolListenException(e)
-
-            # Accept incoming connection on configured port
-            while self.listening:
-                try:
-                    self.socket, address = server.accept()
-                    self.listening = False
-                except socket.timeout:
-                    pass
-
-            # Check if a connection has been made
-            if self.socket:
-                self.connected = True
-                self.socket.settimeout(None)
-            else:
-                self.connected = False
-                self.listening = False
+                pass
+
+    def call(self, callback):
+        try:
+            callback()
+        except:
+            e = sys.exc_info()[1]
+            debug('Exception in event loop: %s' % e)
+
 
-            # Close socket server
+class Listener(object):
+    """
+    Socket server which keeps accepting connections from debugger engine on configured port until it is closed,
+    allowing multiple debugger engines to connect at the same time.
+    """
+
+    def __init__(self, connected, loop):
+        """
+        Keyword arguments:
+        connected -- Function which is called with socket of each accepted connection.
+        loop -- Event loop which accepts connections.
+        """
+        # Set host address to listen for connections
+        self.host = get_value(S.KEY_HOST, S.DEFAULT_HOST)
+        # Set port number to listen for connections
+        self.port = get_value(S.KEY_PORT, S.DEFAULT_PORT)
+        self.connected = connected
+        self.loop = loop
+        self.listening = False
+        self.server = None
+
+    def bind(self):
+        """
+        Create socket server which listens for connections on configured port.
+        """
+        # Create socket server
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if not server:
+            raise ProtocolListenException('Could not create socket server.')
+
+        # Configure socket server
+        try:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            server.bind((self.host, self.port))
+            server.listen(5)
+        except:
+            e = sys.exc_info()[1]
+            debug('Failed to create socket: %s' % e)
             try:
                 server.close()
             except:
                 pass
-            server = None
+            # Substitute exception with readable (custom) message
+            if isinstance(e, TypeError) and not H.is_number(self.port):
+                e = 'Configured port is not a valid integer.'
+            elif isinstance(e, socket.gaierror) and self.host != '':
+                e = 'Hostname (%s) is not specified in hosts file or is an IPv6 address.' % self.host
+            elif hasattr(e, 'errno'):
+                address_or_port = 'address (%s:%d)' % (self.host, self.port) if self.host != '' else 'port (%d)' % self.port
+                if e.errno == errno.EADDRINUSE:
+                    e = 'Another application is already listening on configured %s.' % address_or_port
+                elif e.errno == errno.EADDRNOTAVAIL:
+                    e = 'Configured %s is not accessible.' % address_or_port
+            raise ProtocolListenException(e)
+        self.server = server
+        self.listening = True
 
-            # Return socket connection
-            return self.socket
-        else:
-            raise ProtocolListenException('Could not create socket server.')
+    def start(self):
+        """
+        Start accepting incoming connections by event loop.
+        """
+        self.loop.add_reader(self.server, self.accept)
+
+    def accept(self):
+        """
+        Accept incoming connection, called by event loop when socket server is readable.
+        """
+        try:
+            connection, address = self.server.accept()
+        except socket.error:
+            return
+        debug('Accepted connection from %s:%s' % address[:2])
+        self.connected(connection)
+
+    def close(self):
+        """
+        Stop accepting connections and close socket server, so configured port can be used again immediately.
+        """
+        if not self.listening:
+            return
+        self.listening = False
+        self.loop.remove_reader(self.server)
+        try:
+            self.server.close()
+        except:
+            pass
+        self.server = None
 
 
 class ProtocolException(Exception):
@@ -304,3 +1299,11 @@ class ProtocolConnectionException(ProtocolException):
 
 class ProtocolListenException(ProtocolException):
     pass
+
+
+class ProtocolTimeoutException(ProtocolException):
+    pass
+
+
+class ProtocolCancelledException(ProtocolException):
+    pass
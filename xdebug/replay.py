@@ -0,0 +1,199 @@
+"""
+Recording of DBGp protocol traffic between Sublime Text and debugger engine, and replay of recorded sessions.
+
+Recordings are gzip compressed and start with a header line, followed by a record for each message:
+direction ('>' command sent to debugger engine, '<' message received from debugger engine),
+seconds since start of recording and length of data, separated by spaces and followed by a newline,
+then data of message and a newline.
+
+A recorded session can be replayed as debugger engine, which connects to Sublime Text while it is listening:
+
+    python xdebug/replay.py [--host HOST] [--port PORT] [--speed SPEED] RECORDING
+
+Responses are sent in the recorded order and timing relative to the commands which have been received,
+speed multiplies recorded timing (0 sends responses without delay).
+"""
+import gzip
+import optparse
+import re
+import socket
+import sys
+import threading
+import time
+
+# Header line of recording, which identifies format and its version
+RECORDING_HEADER = b'DBGP-RECORDING 1\n'
+
+# Direction of recorded messages
+RECORD_SENT = b'>'
+RECORD_RECEIVED = b'<'
+
+
+class Recorder(object):
+    """
+    Records messages which are sent to and received from debugger engine, with time since start of recording.
+    """
+
+    def __init__(self, path):
+        """
+        Keyword arguments:
+        path -- Path of recording file.
+        """
+        self.path = path
+        self.file = gzip.open(path, 'wb')
+        self.file.write(RECORDING_HEADER)
+        self.start = time.time()
+        # Messages are recorded from event loop and session worker
+        self.lock = threading.Lock()
+
+    def record(self, direction, parts, length):
+        """
+        Write message to recording.
+
+        Keyword arguments:
+        direction -- Whether message has been sent (RECORD_SENT) or received (RECORD_RECEIVED).
+        parts -- Iterable with parts of data of message.
+        length -- Length of data of message.
+        """
+        with self.lock:
+            if self.file is None:
+                return
+            header = '%s %.6f %d\n' % (direction.decode('ascii'), time.time() - self.start, length)
+            self.file.write(header.encode('ascii'))
+            for part in parts:
+                self.file.write(bytes(part))
+            self.file.write(b'\n')
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def read_recording(path):
+    """
+    Generator which yields direction, seconds since start of recording and data of each recorded message.
+    """
+    recording = gzip.open(path, 'rb')
+    try:
+        if recording.readline() != RECORDING_HEADER:
+            raise ValueError('Not a DBGp recording: %s' % path)
+        while True:
+            header = recording.readline()
+            if not header:
+                return
+            direction, timestamp, length = header.split()
+            data = recording.read(int(length))
+            if len(data) != int(length) or recording.read(1) != b'\n':
+                raise ValueError('Recording is truncated: %s' % path)
+            yield direction, float(timestamp), data
+    finally:
+        recording.close()
+
+
+class Replay(object):
+    """
+    Replays recorded session as debugger engine, by connecting to Sublime Text and responding to its commands.
+    """
+
+    def __init__(self, path, host='127.0.0.1', port=9000, speed=1.0):
+        """
+        Keyword arguments:
+        path -- Path of recording file.
+        host -- Address on which Sublime Text is listening.
+        port -- Port on which Sublime Text is listening.
+        speed -- Factor by which recorded timing is accelerated, or 0 for no delay.
+        """
+        self.path = path
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.socket = None
+        self.buffer = b''
+        # Transaction ID of received commands, by transaction ID of recorded commands
+        self.transaction_ids = {}
+        self.mismatches = 0
+
+    def read_command(self):
+        """
+        Receive next command from Sublime Text, which is terminated by a NULL byte.
+        """
+        while b'\x00' not in self.buffer:
+            data = self.socket.recv(4096)
+            if not data:
+                return None
+            self.buffer += data
+        command, self.buffer = self.buffer.split(b'\x00', 1)
+        return command
+
+    def send_message(self, data):
+        """
+        Send recorded message to Sublime Text, using transaction ID of command which has been received.
+        """
+        def replace(matches):
+            transaction_id = self.transaction_ids.get(matches.group(2), matches.group(2))
+            return matches.group(1) + transaction_id + matches.group(3)
+        data = re.sub(br'(\stransaction_id=")(\d+)(")', replace, data, 1)
+        self.socket.sendall(str(len(data)).encode('ascii') + b'\x00' + data + b'\x00')
+
+    def match_command(self, recorded, command):
+        """
+        Map transaction ID of recorded command to transaction ID of received command.
+        """
+        recorded_id = re.search(br'\s-i (\d+)', recorded)
+        command_id = re.search(br'\s-i (\d+)', command)
+        if recorded_id and command_id:
+            self.transaction_ids[recorded_id.group(1)] = command_id.group(1)
+        if recorded.split(b' ', 1)[0] != command.split(b' ', 1)[0]:
+            self.mismatches += 1
+            sys.stderr.write('Received command differs from recording:\n  recorded: %s\n  received: %s\n' % (recorded.decode('utf8', 'replace'), command.decode('utf8', 'replace')))
+
+    def run(self):
+        """
+        Replay recording, returns number of replayed messages.
+        """
+        self.socket = socket.create_connection((self.host, self.port))
+        replayed = 0
+        # Recorded and actual time of last message, timing is relative to last message
+        recorded_time = None
+        actual_time = time.time()
+        try:
+            for direction, timestamp, data in read_recording(self.path):
+                if direction == RECORD_SENT:
+                    command = self.read_command()
+                    if command is None:
+                        break
+                    self.match_command(data, command)
+                else:
+                    if recorded_time is not None and self.speed > 0:
+                        delay = actual_time + (timestamp - recorded_time) / self.speed - time.time()
+                        if delay > 0:
+                            time.sleep(delay)
+                    self.send_message(data)
+                recorded_time = timestamp
+                actual_time = time.time()
+                replayed += 1
+        finally:
+            self.socket.close()
+        return replayed
+
+
+def main(args=None):
+    parser = optparse.OptionParser(usage='%prog [options] RECORDING', description='Replay recorded DBGp session as debugger engine.')
+    parser.add_option('--host', default='127.0.0.1', help='address on which Sublime Text is listening [default: %default]')
+    parser.add_option('--port', type='int', default=9000, help='port on which Sublime Text is listening [default: %default]')
+    parser.add_option('--speed', type='float', default=1.0, help='factor by which recorded timing is accelerated, 0 for no delay [default: %default]')
+    options, paths = parser.parse_args(args)
+    if len(paths) != 1:
+        parser.error('expected path of recording')
+
+    replay = Replay(paths[0], options.host, options.port, options.speed)
+    start = time.time()
+    replayed = replay.run()
+    sys.stdout.write('Replayed %d messages in %.3f seconds, %d commands differed from recording.\n' % (replayed, time.time() - start, replay.mismatches))
+    return 1 if replay.mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
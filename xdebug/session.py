@@ -1,7 +1,17 @@
 import sublime
 
+import collections
+import fnmatch
+import itertools
+import json
 import sys
 import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 # Helper module
 try:
@@ -28,24 +38,55 @@ from .config import get_value
 from .log import debug, info
 
 # Protocol module
-from .protocol import ProtocolConnectionException
+from .protocol import EventLoop, Listener, Protocol, ProtocolCancelledException, ProtocolConnectionException, ProtocolException, ProtocolTimeoutException
+
+# Recording of messages
+from .replay import Recorder
 
 # Util module
-from .util import get_real_path
+from .util import get_real_path, get_recording_path, save_logpoint_output, save_profile_output
 
 # View module
-from .view import DATA_CONTEXT, DATA_STACK, DATA_WATCH, TITLE_WINDOW_WATCH, generate_context_output, generate_stack_output, get_response_properties, has_debug_view, render_regions, show_content, show_file, show_panel_content
+from .view import DATA_CONTEXT, DATA_STACK, DATA_WATCH, TITLE_WINDOW_WATCH, append_panel_content, generate_context_output, generate_stack_output, find_context_variable, get_property_value, get_response_properties, has_debug_view, index_context, render_regions, set_response_property, show_content, show_file, show_panel_content, unfold_context_variable
 
 
 ACTION_EVALUATE = 'action_evaluate'
 ACTION_EXECUTE = 'action_execute'
+ACTION_EXPAND_PROPERTY = 'action_expand_property'
 ACTION_INIT = 'action_init'
+ACTION_PROFILE = 'action_profile'
+ACTION_REFRESH = 'action_refresh'
 ACTION_REMOVE_BREAKPOINT = 'action_remove_breakpoint'
+ACTION_RUN_TO_LINE = 'action_run_to_line'
 ACTION_SET_BREAKPOINT = 'action_set_breakpoint'
 ACTION_STATUS = 'action_status'
 ACTION_USER_EXECUTE = 'action_user_execute'
 ACTION_WATCH = 'action_watch'
 
+# Number of logpoint records which are written to output at once
+LOGPOINT_BATCH_SIZE = 100
+
+# Session state which is stored for each session, while another session is being debugged
+SESSION_STATE = ['BREAKPOINT_EXCEPTION', 'BREAKPOINT_ROW', 'BREAKPOINT_RUN', 'CONTEXT_DATA', 'CONTEXT_INDEX']
+
+# How to handle connections while another session is being debugged
+CONCURRENT_SESSIONS_CONTINUE = 'continue'
+CONCURRENT_SESSIONS_QUEUE = 'queue'
+
+# Times at which sessions have been admitted during last second, for limiting rate of connections
+ADMISSION_LOCK = threading.Lock()
+ADMISSION_TIMES = collections.deque()
+
+# Priority of actions queued for session worker, actions with lowest value are handled first
+PRIORITY_STOP = -1
+PRIORITY_USER = 0
+PRIORITY_BACKGROUND = 1
+
+# Actions which are not directly initiated by user, others are handled with user priority
+ACTION_PRIORITY = {
+    ACTION_WATCH: PRIORITY_BACKGROUND
+}
+
 
 def is_connected(show_status=False):
     """
@@ -73,8 +114,9 @@ def connection_error(message):
     sublime.error_message('Please restart Xdebug debugging session.\nDisconnected from Xdebug debugger engine.\n' + message)
     info('Connection lost with debugger engine.')
     debug(message)
-    # Reset connection
+    # Reset connection of current session, keep listening for connections and keep sessions which are waiting to be debugged
     try:
+        stop_worker()
         S.SESSION.clear()
     except:
         pass
@@ -85,6 +127,7 @@ def connection_error(message):
         S.BREAKPOINT_ROW = None
         S.BREAKPOINT_RUN = None
         S.CONTEXT_DATA.clear()
+        S.CONTEXT_INDEX.clear()
         async_session = SocketHandler(ACTION_WATCH)
         async_session.start()
     # Reset layout
@@ -93,12 +136,350 @@ def connection_error(message):
     render_regions()
 
 
-class SocketHandler(threading.Thread):
-    def __init__(self, action, **options):
+def cancel_requests():
+    """
+    Cancel commands of current session which are waiting for response of debugger engine.
+    Nothing is cancelled while script is continuing execution, returns number of cancelled commands.
+    """
+    if S.SESSION is None or S.SESSION.is_continuing():
+        return 0
+    return S.SESSION.cancel()
+
+
+def start_worker():
+    """
+    Start worker which handles queued actions for current session.
+    """
+    if S.SESSION and S.SESSION.worker is None:
+        S.SESSION.worker = SessionWorker()
+        S.SESSION.worker.start()
+
+
+def stop_worker():
+    """
+    Stop worker of current session, discarding any actions which have not been handled yet.
+    """
+    if S.SESSION and S.SESSION.worker is not None:
+        S.SESSION.worker.stop()
+        S.SESSION.worker = None
+
+
+def get_event_loop():
+    """
+    Get event loop which receives data from debugger engines and accepts connections, started when not running yet.
+    """
+    if S.EVENT_LOOP is None or not S.EVENT_LOOP.running:
+        S.EVENT_LOOP = EventLoop()
+        S.EVENT_LOOP.start()
+    return S.EVENT_LOOP
+
+
+def start_listener():
+    """
+    Start listening for connections from debugger engine, unless already listening.
+    Raises ProtocolListenException when unable to listen on configured port.
+    """
+    if S.LISTENER is not None and S.LISTENER.listening:
+        return
+    listener = Listener(accept_connection, get_event_loop())
+    listener.bind()
+    listener.start()
+    S.LISTENER = listener
+
+
+def stop_listener():
+    """
+    Stop listening for connections from debugger engine and close sessions which are waiting to be debugged.
+    """
+    if S.LISTENER is not None:
+        S.LISTENER.close()
+        S.LISTENER = None
+    for waiting_session in S.SESSIONS:
+        waiting_session.clear()
+    del S.SESSIONS[:]
+
+
+def stop_sessions():
+    """
+    Close current and waiting sessions, stop listening for connections and stop event loop, when package is unloaded.
+    """
+    stop_worker()
+    stop_listener()
+    if S.SESSION is not None:
+        S.SESSION.clear()
+        S.SESSION = None
+    if S.EVENT_LOOP is not None:
+        S.EVENT_LOOP.stop()
+        S.EVENT_LOOP = None
+
+
+def accept_connection(connection):
+    """
+    Receive data of connection which has been accepted by listener, in event loop.
+    Session is admitted as soon as initialization of debugger engine has been received.
+
+    Keyword arguments:
+    connection -- Socket of accepted connection.
+    """
+    new_session = Protocol()
+    new_session.received_callback = lambda: admit_session(new_session)
+    # Record messages of session, including initialization of debugger engine
+    if get_value(S.KEY_RECORD_SESSION):
+        try:
+            new_session.recorder = Recorder(get_recording_path())
+            info('Recording session to %s' % new_session.recorder.path)
+        except:
+            e = sys.exc_info()[1]
+            info('Unable to record session: %s' % e)
+    new_session.attach(connection, get_event_loop())
+
+
+def admit_session(new_session):
+    """
+    Check initialization of debugger engine which has been received for new session,
+    and reject session when it does not match session filter or exceeds rate limit.
+
+    Keyword arguments:
+    new_session -- Session of accepted connection.
+    """
+    new_session.received_callback = None
+    try:
+        new_session.init = new_session.read()
+    except ProtocolException:
+        e = sys.exc_info()[1]
+        debug('Failed to initialize session: %s' % e)
+        new_session.clear()
+        return
+
+    # Reject session which does not match session filter
+    session_filter = get_value(S.KEY_SESSION_FILTER)
+    if not is_session_allowed(new_session.init, session_filter):
+        continue_session(new_session, session_filter.get('action') if session_filter.get('action') in (dbgp.DETACH, dbgp.RUN) else dbgp.DETACH)
+        return
+
+    sublime.set_timeout(lambda: accept_session(new_session), 0)
+
+
+def is_session_allowed(init, session_filter):
+    """
+    Check if initialization of debugger engine matches glob patterns of session filter,
+    and number of sessions which have been allowed during last second does not exceed rate limit.
+
+    Keyword arguments:
+    init -- Initialization response of debugger engine.
+    session_filter -- Dictionary with (list of) glob patterns by attribute and rate limit.
+    """
+    if not isinstance(session_filter, dict) or not session_filter:
+        return True
+
+    for attribute in (dbgp.INIT_IDEKEY, dbgp.INIT_APPID, dbgp.INIT_FILEURI, dbgp.INIT_LANGUAGE):
+        patterns = session_filter.get(attribute)
+        if not patterns:
+            continue
+        if not isinstance(patterns, list):
+            patterns = [patterns]
+        value = init.get(attribute) or ''
+        for pattern in patterns:
+            if fnmatch.fnmatchcase(value, pattern):
+                break
+        else:
+            debug('Rejected session, %s "%s" does not match session filter.' % (attribute, value))
+            return False
+
+    rate_limit = session_filter.get('rate_limit')
+    if H.is_number(rate_limit) and rate_limit > 0:
+        with ADMISSION_LOCK:
+            now = time.time()
+            while ADMISSION_TIMES and now - ADMISSION_TIMES[0] >= 1:
+                ADMISSION_TIMES.popleft()
+            if len(ADMISSION_TIMES) >= rate_limit:
+                debug('Rejected session, exceeding rate limit of %d sessions per second.' % rate_limit)
+                return False
+            ADMISSION_TIMES.append(now)
+    return True
+
+
+def accept_session(new_session):
+    """
+    Handle session which has been admitted.
+    Session becomes current session when it is waiting for connection,
+    otherwise session is continued or queued depending on configuration.
+
+    Keyword arguments:
+    new_session -- Session of connection which has received initialization of debugger engine.
+    """
+    # Session has been stopped in the meantime
+    if S.LISTENER is None:
+        new_session.clear()
+        return
+
+    # Session is being restarted, new session is picked up on start
+    if S.SESSION is None:
+        queue_session(new_session)
+        return
+
+    # Current session is waiting for connection, hand over its worker
+    if S.SESSION.listening:
+        new_session.worker = S.SESSION.worker
+        S.SESSION.worker = None
+        S.SESSION = new_session
+        sublime.set_timeout(lambda: sublime.status_message('Xdebug: Connected'), 100)
+        async_session = SocketHandler(ACTION_INIT)
+        async_session.start()
+        return
+
+    if get_value(S.KEY_CONCURRENT_SESSIONS) == CONCURRENT_SESSIONS_QUEUE:
+        queue_session(new_session)
+        sublime.status_message('Xdebug: Session waiting to be debugged (%d)' % len(S.SESSIONS))
+    else:
+        continue_session(new_session)
+
+
+def queue_session(waiting_session):
+    """
+    Add session to sessions which are waiting to be debugged, session is removed as soon as its connection fails.
+
+    Keyword arguments:
+    waiting_session -- Session which is not being debugged.
+    """
+    waiting_session.received_callback = lambda: sublime.set_timeout(lambda: remove_failed_session(waiting_session), 0)
+    S.SESSIONS.append(waiting_session)
+
+
+def remove_failed_session(waiting_session):
+    """
+    Remove session which is waiting to be debugged when its connection has failed.
+
+    Keyword arguments:
+    waiting_session -- Session from list of sessions which are waiting to be debugged.
+    """
+    if waiting_session.error is None or waiting_session not in S.SESSIONS:
+        return
+    debug('Removed session which was waiting to be debugged: %s' % waiting_session.error)
+    S.SESSIONS.remove(waiting_session)
+    waiting_session.clear()
+    sublime.status_message('Xdebug: Session waiting to be debugged has been disconnected (%d remaining)' % len(S.SESSIONS))
+
+
+def continue_session(concurrent_session, command=dbgp.DETACH):
+    """
+    Let script of session continue running without debugging it, by detaching from debugger engine.
+    Connection is closed without waiting for response, debugger engine continues when connection is closed.
+    """
+    try:
+        concurrent_session.send(command)
+    except ProtocolException:
+        e = sys.exc_info()[1]
+        debug('Failed to continue concurrent session: %s' % e)
+    finally:
+        concurrent_session.clear()
+
+
+def get_session_label(waiting_session):
+    """
+    Get description of session which is waiting to be debugged, for showing in quick panel.
+    """
+    fileuri = waiting_session.init.get(dbgp.INIT_FILEURI) if waiting_session.init is not None else None
+    label = get_real_path(fileuri) if fileuri else 'Unknown file'
+    state = waiting_session.state or {}
+    if state.get('BREAKPOINT_ROW'):
+        return [label, 'Break: %s:%s' % (state['BREAKPOINT_ROW']['filename'], state['BREAKPOINT_ROW']['lineno'])]
+    return [label, 'Waiting to be debugged']
+
+
+def focus_session(waiting_session):
+    """
+    Make session which is waiting to be debugged current session, current session is queued when it is connected.
+
+    Keyword arguments:
+    waiting_session -- Session from list of sessions which are waiting to be debugged.
+    """
+    if S.SESSION_BUSY:
+        sublime.status_message('Xdebug: Unable to switch session while current session is busy.')
+        return
+    if waiting_session in S.SESSIONS:
+        S.SESSIONS.remove(waiting_session)
+    waiting_session.received_callback = None
+
+    # Store state of current session
+    if S.SESSION is not None:
+        stop_worker()
+        if S.SESSION.connected:
+            S.SESSION.state = dict((key, getattr(S, key)) for key in SESSION_STATE)
+            queue_session(S.SESSION)
+        else:
+            S.SESSION.clear()
+
+    # Restore state of session
+    state = waiting_session.state or {}
+    S.SESSION = waiting_session
+    S.SESSION.state = None
+    S.BREAKPOINT_EXCEPTION = state.get('BREAKPOINT_EXCEPTION')
+    S.BREAKPOINT_ROW = state.get('BREAKPOINT_ROW')
+    S.BREAKPOINT_RUN = state.get('BREAKPOINT_RUN')
+    S.CONTEXT_DATA = state.get('CONTEXT_DATA', H.new_dictionary())
+    S.CONTEXT_INDEX = state.get('CONTEXT_INDEX', {})
+    start_worker()
+
+    # Initialize session when it has not been debugged yet, otherwise show its breakpoint values again
+    async_session = SocketHandler(ACTION_REFRESH if state else ACTION_INIT)
+    async_session.start()
+
+
+class SessionWorker(threading.Thread):
+    """
+    Long-lived thread which owns connection of session and handles queued actions by priority.
+    Actions with same priority are handled in order of which they have been queued.
+    """
+    def __init__(self):
         threading.Thread.__init__(self)
+        self.daemon = True
+        self.queue = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.running = True
+
+    def put(self, handler, priority=PRIORITY_USER):
+        self.queue.put((priority, next(self.sequence), handler))
+
+    def stop(self):
+        self.running = False
+        self.queue.put((PRIORITY_STOP, next(self.sequence), None))
+
+    def run(self):
+        while self.running:
+            priority, sequence, handler = self.queue.get()
+            if handler is None or not self.running:
+                break
+            # Keep handling actions after unexpected exception, such as invalid response data
+            try:
+                handler.run()
+            except:
+                e = sys.exc_info()[1]
+                info('Exception while handling action (%s): %s' % (handler.action, e))
+
+
+class SocketHandler(object):
+    def __init__(self, action, callback=None, **options):
+        """
+        Keyword arguments:
+        action -- Action to handle for session.
+        callback -- Function to call (in main thread) when action has been handled.
+        options -- Options for action.
+        """
         self.action = action
+        self.callback = callback
         self.options = options
 
+    def start(self):
+        """
+        Queue action for worker of current session, or handle action in separate thread when there is no worker.
+        """
+        worker = S.SESSION.worker if S.SESSION else None
+        if worker is not None and worker.is_alive():
+            worker.put(self, ACTION_PRIORITY.get(self.action, PRIORITY_USER))
+        else:
+            threading.Thread(target=self.run).start()
+
     def get_option(self, option, default_value=None):
         if option in self.options.keys():
             return self.options[option]
@@ -146,15 +527,27 @@ class SocketHandler(threading.Thread):
             # Execute
             elif self.action == ACTION_EXECUTE:
                 self.execute(self.get_option('command'))
+            # Expand property
+            elif self.action == ACTION_EXPAND_PROPERTY:
+                self.expand_property(self.get_option('row'), self.get_option('name'))
             # Init
             elif self.action == ACTION_INIT:
                 self.init()
+            # Profile
+            elif self.action == ACTION_PROFILE:
+                self.profile()
+            # Refresh
+            elif self.action == ACTION_REFRESH:
+                self.refresh()
             # Remove breakpoint
             elif self.action == ACTION_REMOVE_BREAKPOINT:
                 self.remove_breakpoint(self.get_option('breakpoint_id'))
+            # Run to line
+            elif self.action == ACTION_RUN_TO_LINE:
+                self.run_to_line(self.get_option('filename'), self.get_option('lineno'))
             # Set breakpoint
             elif self.action == ACTION_SET_BREAKPOINT:
-                self.set_breakpoint(self.get_option('filename'), self.get_option('lineno'), self.get_option('expression'))
+                self.set_breakpoint(self.get_option('filename'), self.get_option('lineno'), self.get_option('expression'), self.get_option('hit_value'), self.get_option('hit_condition'))
             # Status
             elif self.action == ACTION_STATUS:
                 self.status()
@@ -164,24 +557,37 @@ class SocketHandler(threading.Thread):
             # Watch expression
             elif self.action == ACTION_WATCH:
                 self.watch_expression()
-        # Show dialog on connection error
-        except ProtocolConnectionException:
+        # Keep session when debugger engine did not respond in time
+        except ProtocolTimeoutException:
             e = sys.exc_info()[1]
+            info('%s' % e)
+            self.status_message('Xdebug: %s' % e)
+        # Command has been cancelled by user
+        except ProtocolCancelledException:
+            e = sys.exc_info()[1]
+            debug('%s' % e)
+        # Show dialog on connection error or protocol error, after which connection can not be used anymore
+        except ProtocolException:
+            e = sys.exc_info()[1]
+            if S.SESSION is not None:
+                S.SESSION.stop_receiving()
             self.timeout(lambda: connection_error('%s' % e))
         finally:
             S.SESSION_BUSY = False
+            # Notify caller that action has been handled
+            if self.callback is not None:
+                self.timeout(self.callback)
 
     def evaluate(self, expression):
         if not expression or not is_connected():
             return
         # Send 'eval' command to debugger engine with code to evaluate
-        S.SESSION.send(dbgp.EVAL, expression=expression)
         if get_value(S.KEY_PRETTY_OUTPUT):
-            response = S.SESSION.read()
+            response = S.SESSION.request(dbgp.EVAL, expression=expression).result()
             properties = get_response_properties(response, expression)
             response = generate_context_output(properties)
         else:
-            response = S.SESSION.read(return_string=True)
+            response = S.SESSION.request(dbgp.EVAL, expression=expression, raw=True).result()
 
         # Show response data in output panel
         self.timeout(lambda: show_panel_content(response))
@@ -195,11 +601,29 @@ class SocketHandler(threading.Thread):
         S.SESSION.send(command)
         response = S.SESSION.read()
 
+        # Continue running after logging values of logpoints, or until temporary breakpoint has been hit without handling other breakpoints
+        records = []
+        try:
+            while self.log_break(response, records) or self.skip_break(response):
+                # Write output of logpoints in batches, instead of on each hit
+                if len(records) >= LOGPOINT_BATCH_SIZE:
+                    self.write_logpoint_output(records)
+                    records = []
+                S.SESSION.send(dbgp.RUN)
+                response = S.SESSION.read()
+        finally:
+            self.write_logpoint_output(records)
+        S.BREAKPOINT_RUN = None
+
         # Reset previous breakpoint values
         S.BREAKPOINT_EXCEPTION = None
         S.BREAKPOINT_ROW = None
         S.CONTEXT_DATA.clear()
-        self.watch_expression()
+        S.CONTEXT_INDEX.clear()
+        # Watch expressions are evaluated along with other values on breakpoint
+        for watch in S.WATCH:
+            watch['value'] = None
+        self.show_watch_expression()
         # Set debug layout
         self.run_command('xdebug_layout')
 
@@ -216,16 +640,6 @@ class SocketHandler(threading.Thread):
                     # Remember Exception name and first line of message
                     S.BREAKPOINT_EXCEPTION = {'name': exception, 'message': child.text.split('\n')[0], 'filename': fileuri, 'lineno': lineno}
 
-                # Check if temporary breakpoint is set and hit
-                if S.BREAKPOINT_RUN is not None and S.BREAKPOINT_RUN['filename'] == filename and S.BREAKPOINT_RUN['lineno'] == lineno:
-                    # Remove temporary breakpoint
-                    if S.BREAKPOINT_RUN['filename'] in S.BREAKPOINT and S.BREAKPOINT_RUN['lineno'] in S.BREAKPOINT[S.BREAKPOINT_RUN['filename']]:
-                        self.run_view_command('xdebug_breakpoint', {'rows': [S.BREAKPOINT_RUN['lineno']], 'filename': S.BREAKPOINT_RUN['filename']})
-                    S.BREAKPOINT_RUN = None
-                # Skip if temporary breakpoint was not hit
-                if S.BREAKPOINT_RUN is not None and (S.BREAKPOINT_RUN['filename'] != filename or S.BREAKPOINT_RUN['lineno'] != lineno):
-                    self.run_command('xdebug_execute', {'command': 'run'})
-                    return
                 # Show debug/status output
                 self.status_message('Xdebug: Breakpoint')
                 info('Break: ' + filename + ':' + lineno)
@@ -234,18 +648,18 @@ class SocketHandler(threading.Thread):
                 # Focus/Open file window view
                 self.timeout(lambda: show_file(filename, lineno))
 
-        # On breakpoint get context variables and stack history
+        # On breakpoint get context variables, stack history and watch expressions
         if response.get(dbgp.ATTRIBUTE_STATUS) == dbgp.STATUS_BREAK:
+            context, stack = self.get_break_values()
+
             # Context variables
-            context = self.get_context_values()
             self.timeout(lambda: show_content(DATA_CONTEXT, context))
 
             # Stack history
-            stack = self.get_stack_values()
             self.timeout(lambda: show_content(DATA_STACK, stack))
 
             # Watch expressions
-            self.watch_expression()
+            self.show_watch_expression()
 
         # Reload session when session stopped, by reaching end of file or interruption
         if response.get(dbgp.ATTRIBUTE_STATUS) == dbgp.STATUS_STOPPING or response.get(dbgp.ATTRIBUTE_STATUS) == dbgp.STATUS_STOPPED:
@@ -256,6 +670,187 @@ class SocketHandler(threading.Thread):
         # Render breakpoint markers
         self.timeout(lambda: render_regions())
 
+    def skip_break(self, response):
+        """
+        Check if script is paused on a breakpoint other than temporary breakpoint of Run To Line.
+        """
+        if S.BREAKPOINT_RUN is None or response.get(dbgp.ATTRIBUTE_STATUS) != dbgp.STATUS_BREAK:
+            return False
+        for child in response:
+            if child.tag == dbgp.ELEMENT_BREAKPOINT or child.tag == dbgp.ELEMENT_PATH_BREAKPOINT or child.tag == dbgp.ELEMENT_PATH_SECURE_BREAKPOINT:
+                filename = get_real_path(child.get(dbgp.BREAKPOINT_FILENAME))
+                lineno = child.get(dbgp.BREAKPOINT_LINENO)
+                if S.BREAKPOINT_RUN['filename'] == filename and S.BREAKPOINT_RUN['lineno'] == lineno:
+                    return False
+        debug('Skip break, temporary breakpoint has not been hit')
+        return True
+
+    def log_break(self, response, records):
+        """
+        Check if script is paused on a logpoint, in which case values of its expressions are added to records.
+
+        Keyword arguments:
+        response -- Response of debugger engine to continuation command.
+        records -- List to which record of logpoint is added.
+        """
+        if response.get(dbgp.ATTRIBUTE_STATUS) != dbgp.STATUS_BREAK:
+            return False
+        for child in response:
+            if child.tag == dbgp.ELEMENT_BREAKPOINT or child.tag == dbgp.ELEMENT_PATH_BREAKPOINT or child.tag == dbgp.ELEMENT_PATH_SECURE_BREAKPOINT:
+                if child.get(dbgp.BREAKPOINT_EXCEPTION):
+                    return False
+                filename = get_real_path(child.get(dbgp.BREAKPOINT_FILENAME))
+                lineno = child.get(dbgp.BREAKPOINT_LINENO)
+                bp = S.BREAKPOINT.get(filename, {}).get(lineno)
+                if not bp or not bp['enabled'] or not bp.get('log'):
+                    return False
+                records.append({'file': filename, 'line': int(lineno), 'time': time.time(), 'values': self.get_log_values(bp['log'])})
+                # Break on logpoint when it is destination of Run To Line
+                return not (S.BREAKPOINT_RUN is not None and S.BREAKPOINT_RUN['filename'] == filename and S.BREAKPOINT_RUN['lineno'] == lineno)
+        return False
+
+    def get_log_values(self, expressions):
+        """
+        Evaluate expressions of logpoint, by sending all commands at once before waiting for their responses.
+        """
+        values = H.new_dictionary()
+        transactions = [(expression, S.SESSION.request(dbgp.EVAL, expression=expression)) for expression in expressions]
+        for expression, transaction in transactions:
+            properties = get_response_properties(transaction.result(), expression)
+            values[expression] = get_property_value(next(iter(properties.values()))) if properties else None
+        return values
+
+    def write_logpoint_output(self, records):
+        """
+        Write records of logpoints to output file and output panel.
+        """
+        if not records:
+            return
+        try:
+            save_logpoint_output(records)
+        except (IOError, OSError):
+            e = sys.exc_info()[1]
+            info('Failed to write logpoint output: %s' % e)
+        output = H.unicode_string('')
+        for record in records:
+            values = ['%s = %s' % (expression, json.dumps(value)) for expression, value in record['values'].items()]
+            output += H.unicode_string('[%s] %s:%s %s\n' % (time.strftime('%H:%M:%S', time.localtime(record['time'])), record['file'], record['line'], ', '.join(values)))
+        self.timeout(lambda: append_panel_content(output))
+
+    def run_to_line(self, filename, lineno):
+        """
+        Set temporary breakpoint, which is removed by debugger engine when hit, and run script.
+        """
+        if not filename or not lineno or not is_connected():
+            return
+
+        # Get path of file on server
+        fileuri = get_real_path(filename, True)
+        response = S.SESSION.request(dbgp.BREAKPOINT_SET, t='line', f=fileuri, n=lineno, r=1).result()
+        S.BREAKPOINT_RUN = {'filename': filename, 'lineno': lineno, 'id': response.get(dbgp.ATTRIBUTE_BREAKPOINT_ID)}
+
+        self.execute(dbgp.RUN)
+
+    def profile(self):
+        """
+        Run script while interrupting it at an interval to sample its stack, until script has finished.
+        Samples are counted by stack and written to output file in collapsed stack format.
+        """
+        if not is_connected():
+            return
+
+        # Debugger engine should accept commands while script is running
+        response = S.SESSION.request(dbgp.FEATURE_GET, n=dbgp.FEATURE_NAME_SUPPORTS_ASYNC).result()
+        if response.text is None or response.text.strip() != '1':
+            self.status_message('Xdebug: Debugger engine does not support profiling, unable to interrupt running script.')
+            return
+
+        interval = get_value(S.KEY_PROFILE_INTERVAL, 10)
+        if not H.is_number(interval) or interval <= 0:
+            interval = 10
+        interval = interval / 1000.0
+
+        samples = H.new_dictionary()
+        status = None
+        self.status_message('Xdebug: Profiling request')
+        try:
+            while is_connected():
+                run_transaction = S.SESSION.request(dbgp.RUN)
+                # Interrupt script when it is still running after interval
+                if not run_transaction.wait(interval):
+                    S.SESSION.request(dbgp.BREAK).result()
+                    sample = True
+                else:
+                    sample = False
+                status = run_transaction.result().get(dbgp.ATTRIBUTE_STATUS)
+                if status != dbgp.STATUS_BREAK:
+                    break
+                # Breakpoints which are hit before interval has expired are not sampled
+                if not sample:
+                    continue
+                stack = S.SESSION.request(dbgp.STACK_GET).result()
+                frames = []
+                for child in stack:
+                    if child.tag == dbgp.ELEMENT_STACK or child.tag == dbgp.ELEMENT_PATH_STACK:
+                        where = child.get(dbgp.STACK_WHERE) or '%s:%s' % (get_real_path(child.get(dbgp.STACK_FILENAME)), child.get(dbgp.STACK_LINENO))
+                        frames.append(where.replace(';', ','))
+                if frames:
+                    # Collapsed stack starts with outermost frame
+                    key = ';'.join(reversed(frames))
+                    samples[key] = samples.get(key, 0) + 1
+        except ProtocolConnectionException:
+            # Profiling ends when session has been stopped
+            if is_connected():
+                raise
+        finally:
+            self.write_profile_output(samples)
+
+        # Reload session when session stopped, by reaching end of file or interruption
+        if status == dbgp.STATUS_STOPPING or status == dbgp.STATUS_STOPPED:
+            self.run_command('xdebug_session_stop', {'restart': True})
+            self.run_command('xdebug_session_start', {'restart': True})
+
+    def write_profile_output(self, samples):
+        """
+        Write samples of profiled request to output file and open it.
+        """
+        if not samples:
+            self.status_message('Xdebug: No samples have been collected while profiling request.')
+            return
+        try:
+            filename = save_profile_output(samples)
+        except (IOError, OSError):
+            e = sys.exc_info()[1]
+            info('Failed to write profile output: %s' % e)
+            return
+        self.status_message('Xdebug: Collected %d samples while profiling request.' % sum(samples.values()))
+        self.timeout(lambda: sublime.active_window().open_file(filename))
+
+    def get_break_values(self):
+        """
+        Get variables in current context, stack information and values of watch expressions,
+        by sending all commands at once before waiting for their responses.
+        """
+        context = H.new_dictionary()
+        stack = None
+        if is_connected():
+            try:
+                context_transactions = self.request_context_values(context)
+                stack_transaction = S.SESSION.request(dbgp.STACK_GET)
+                watch_transactions = self.request_watch_values()
+                for transaction in context_transactions + [stack_transaction] + watch_transactions:
+                    transaction.result()
+                stack = stack_transaction.response
+            except ProtocolConnectionException:
+                e = sys.exc_info()[1]
+                self.timeout(lambda: connection_error('%s' % e))
+
+        # Store context variables in session
+        S.CONTEXT_DATA = context
+        S.CONTEXT_INDEX = index_context(context)
+
+        return generate_context_output(context), generate_stack_output(stack)
+
     def get_context_values(self):
         """
         Get variables in current context.
@@ -265,25 +860,108 @@ class SocketHandler(threading.Thread):
 
         context = H.new_dictionary()
         try:
-            # Super global variables
-            if get_value(S.KEY_SUPER_GLOBALS):
-                S.SESSION.send(dbgp.CONTEXT_GET, c=dbgp.CONTEXT_ID_SUPERGLOBALS)
-                response = S.SESSION.read()
-                context.update(get_response_properties(response))
-
-            # Local variables
-            S.SESSION.send(dbgp.CONTEXT_GET)
-            response = S.SESSION.read()
-            context.update(get_response_properties(response))
+            for transaction in self.request_context_values(context):
+                transaction.result()
         except ProtocolConnectionException:
             e = sys.exc_info()[1]
             self.timeout(lambda: connection_error('%s' % e))
 
         # Store context variables in session
         S.CONTEXT_DATA = context
+        S.CONTEXT_INDEX = index_context(context)
 
         return generate_context_output(context)
 
+    def request_context_values(self, context):
+        """
+        Send commands for getting variables in current context, returns list of transactions.
+
+        Keyword arguments:
+        context -- Dictionary in which variables are stored as soon as they have been received.
+        """
+        # Store each property as soon as it has been received, along with id of context it belongs to
+        def set_property(child, response, context_id=dbgp.CONTEXT_ID_LOCALS):
+            set_response_property(context, child, response)
+            property_key = child.get(dbgp.PROPERTY_FULLNAME, child.get(dbgp.PROPERTY_NAME))
+            if property_key in context:
+                context[property_key].context = context_id
+
+        def set_superglobal_property(child, response):
+            set_property(child, response, dbgp.CONTEXT_ID_SUPERGLOBALS)
+
+        transactions = []
+        # Super global variables
+        if get_value(S.KEY_SUPER_GLOBALS):
+            transactions.append(S.SESSION.request(dbgp.CONTEXT_GET, c=dbgp.CONTEXT_ID_SUPERGLOBALS, handler=set_superglobal_property))
+
+        # Local variables
+        transactions.append(S.SESSION.request(dbgp.CONTEXT_GET, handler=set_property))
+        return transactions
+
+    def expand_property(self, row, variable_name):
+        """
+        Retrieve children of variable in context which have not been received yet,
+        one page at a time as limited by max_children.
+
+        Keyword arguments:
+        row -- Row on which variable is shown in context window.
+        variable_name -- Fullname of variable, to verify context has not changed since row was selected.
+        """
+        if row is None or not is_connected():
+            return
+
+        entry = find_context_variable(row)
+        if not entry or entry['variable'].fullname != variable_name:
+            self.status_message('Xdebug: Unable to find variable "%s" in context.' % variable_name)
+            return
+        variable = entry['variable']
+
+        # Determine page of children to retrieve
+        children = variable.children or []
+        numchildren = int(variable.numchildren) if H.is_digit(variable.numchildren) else 0
+        if len(children) >= numchildren:
+            self.status_message('Xdebug: All children of "%s" have been retrieved.' % variable_name)
+            return
+        page = 0
+        if children:
+            pagesize = int(variable.pagesize) if H.is_digit(variable.pagesize) else 0
+            # Without a page size, received children are considered to be the first page
+            if pagesize <= 0:
+                pagesize = len(children)
+            page = len(children) // pagesize
+
+        # Property name is quoted, as it might contain spaces
+        fullname = variable.fullname or variable_name
+        arguments = {'n': '"%s"' % fullname.replace('\\', '\\\\').replace('"', '\\"'), 'p': page}
+        if entry['context'] is not None:
+            arguments['c'] = entry['context']
+
+        try:
+            response = S.SESSION.request(dbgp.PROPERTY_GET, **arguments).result()
+        except ProtocolConnectionException:
+            e = sys.exc_info()[1]
+            self.timeout(lambda: connection_error('%s' % e))
+            return
+
+        # Append retrieved children to variable in context
+        for received in get_response_properties(response).values():
+            if received.children is not None:
+                if variable.children is None:
+                    variable.children = []
+                variable.children.extend(received.children)
+            if received.numchildren is not None:
+                variable.numchildren = received.numchildren
+            variable.page = received.page
+            if received.pagesize is not None:
+                variable.pagesize = received.pagesize
+            break
+
+        S.CONTEXT_INDEX = index_context(S.CONTEXT_DATA)
+        context = generate_context_output(S.CONTEXT_DATA)
+        self.timeout(lambda: show_content(DATA_CONTEXT, context))
+        # Children are appended below variable, which therefore remains on same row
+        self.timeout(lambda: unfold_context_variable(entry['begin']))
+
     def get_stack_values(self):
         """
         Get stack information for current context.
@@ -292,8 +970,7 @@ class SocketHandler(threading.Thread):
         if is_connected():
             try:
                 # Get stack information
-                S.SESSION.send(dbgp.STACK_GET)
-                response = S.SESSION.read()
+                response = S.SESSION.request(dbgp.STACK_GET).result()
             except ProtocolConnectionException:
                 e = sys.exc_info()[1]
                 self.timeout(lambda: connection_error('%s' % e))
@@ -303,66 +980,89 @@ class SocketHandler(threading.Thread):
         """
         Evaluate all watch expressions in current context.
         """
+        try:
+            for transaction in self.request_watch_values():
+                transaction.result()
+        except ProtocolConnectionException:
+            pass
+
+    def request_watch_values(self):
+        """
+        Send commands for evaluating all enabled watch expressions in current context, returns list of transactions.
+        """
+        transactions = []
         for index, item in enumerate(S.WATCH):
             # Reset value for watch expression
             S.WATCH[index]['value'] = None
 
             # Evaluate watch expression when connected to debugger engine
-            if is_connected():
-                if item['enabled']:
-                    watch_value = None
-                    try:
-                        S.SESSION.send(dbgp.EVAL, expression=item['expression'])
-                        response = S.SESSION.read()
-
-                        watch_value = get_response_properties(response, item['expression'])
-                    except ProtocolConnectionException:
-                        pass
+            if is_connected() and item['enabled']:
+                # Store value of watch expression when response has been received
+                def set_value(response, index=index, expression=item['expression']):
+                    S.WATCH[index]['value'] = get_response_properties(response, expression)
 
-                    S.WATCH[index]['value'] = watch_value
+                transactions.append(S.SESSION.request(dbgp.EVAL, expression=item['expression'], callback=set_value))
+        return transactions
 
     def init(self):
         if not is_connected():
             return
 
-        # Connection initialization
-        init = S.SESSION.read()
+        # Connection initialization, which might have been received while session was waiting to be debugged
+        if S.SESSION.init is None:
+            S.SESSION.init = S.SESSION.read()
+        init = S.SESSION.init
+
+        # Send all commands for initialization at once, before waiting for their responses
+        transactions = []
 
         # More detailed internal information on properties
-        S.SESSION.send(dbgp.FEATURE_SET, n='show_hidden', v=1)
-        S.SESSION.read()
+        transactions.append(S.SESSION.request(dbgp.FEATURE_SET, n='show_hidden', v=1))
+
+        # Prefer UTF-8 encoded data, debugger engine responds with error when encoding is not supported
+        transactions.append(S.SESSION.request(dbgp.FEATURE_SET, n=dbgp.FEATURE_NAME_ENCODING, v='UTF-8'))
+
+        # Decode response data by encoding which is in use by debugger engine
+        current_session = S.SESSION
+
+        def set_encoding(response):
+            if response.get(dbgp.ATTRIBUTE_FEATURE_SUPPORTED) != '0' and response.text:
+                current_session.set_encoding(response.text.strip())
+        transactions.append(S.SESSION.request(dbgp.FEATURE_GET, n=dbgp.FEATURE_NAME_ENCODING, callback=set_encoding))
 
         # Set max children limit
         max_children = get_value(S.KEY_MAX_CHILDREN)
         if max_children is not False and max_children is not True and (H.is_number(max_children) or H.is_digit(max_children)):
-            S.SESSION.send(dbgp.FEATURE_SET, n=dbgp.FEATURE_NAME_MAX_CHILDREN, v=max_children)
-            S.SESSION.read()
+            transactions.append(S.SESSION.request(dbgp.FEATURE_SET, n=dbgp.FEATURE_NAME_MAX_CHILDREN, v=max_children))
 
         # Set max data limit
         max_data = get_value(S.KEY_MAX_DATA)
         if max_data is not False and max_data is not True and (H.is_number(max_data) or H.is_digit(max_data)):
-            S.SESSION.send(dbgp.FEATURE_SET, n=dbgp.FEATURE_NAME_MAX_DATA, v=max_data)
-            S.SESSION.read()
+            transactions.append(S.SESSION.request(dbgp.FEATURE_SET, n=dbgp.FEATURE_NAME_MAX_DATA, v=max_data))
 
         # Set max depth limit
         max_depth = get_value(S.KEY_MAX_DEPTH)
         if max_depth is not False and max_depth is not True and (H.is_number(max_depth) or H.is_digit(max_depth)):
-            S.SESSION.send(dbgp.FEATURE_SET, n=dbgp.FEATURE_NAME_MAX_DEPTH, v=max_depth)
-            S.SESSION.read()
+            transactions.append(S.SESSION.request(dbgp.FEATURE_SET, n=dbgp.FEATURE_NAME_MAX_DEPTH, v=max_depth))
 
         # Set breakpoints for files
         for filename, breakpoint_data in S.BREAKPOINT.items():
             if breakpoint_data:
                 for lineno, bp in breakpoint_data.items():
                     if bp['enabled']:
-                        self.set_breakpoint(filename, lineno, bp['expression'])
+                        transactions.append(self.request_breakpoint(filename, lineno, bp['expression'], bp.get('hit_value'), bp.get('hit_condition')))
                         debug('breakpoint_set: ' + filename + ':' + lineno)
 
         # Set breakpoints for exceptions
         break_on_exception = get_value(S.KEY_BREAK_ON_EXCEPTION)
         if isinstance(break_on_exception, list):
             for exception_name in break_on_exception:
-                self.set_exception(exception_name)
+                transactions.append(self.request_exception(exception_name))
+
+        # Wait for responses, breakpoint ids are updated as responses are received
+        for transaction in transactions:
+            if transaction is not None:
+                transaction.result()
 
         # Determine if client should break at first line on connect
         if get_value(S.KEY_BREAK_ON_START):
@@ -377,23 +1077,44 @@ class SocketHandler(threading.Thread):
             # Focus/Open file window view
             self.timeout(lambda: show_file(filename, 1))
 
+            context, stack = self.get_break_values()
+
             # Context variables
-            context = self.get_context_values()
             self.timeout(lambda: show_content(DATA_CONTEXT, context))
 
             # Stack history
-            stack = self.get_stack_values()
             if not stack:
                 stack = H.unicode_string('[{level}] {filename}.{where}:{lineno}\n'
                                          .format(level=0, where='{main}', lineno=1, filename=fileuri))
             self.timeout(lambda: show_content(DATA_STACK, stack))
 
             # Watch expressions
-            self.watch_expression()
+            self.show_watch_expression()
         else:
             # Tell script to run it's process
             self.run_command('xdebug_execute', {'command': 'run'})
 
+    def refresh(self):
+        """
+        Show breakpoint, context variables, stack history and watch expressions of current session again,
+        after it has been switched to.
+        """
+        if not is_connected():
+            return
+
+        if S.BREAKPOINT_ROW is not None:
+            filename = S.BREAKPOINT_ROW['filename']
+            lineno = S.BREAKPOINT_ROW['lineno']
+            self.timeout(lambda: show_file(filename, lineno))
+
+        context, stack = self.get_break_values()
+        self.timeout(lambda: show_content(DATA_CONTEXT, context))
+        self.timeout(lambda: show_content(DATA_STACK, stack))
+        self.show_watch_expression()
+
+        # Render breakpoint markers
+        self.timeout(lambda: render_regions())
+
     def remove_breakpoint(self, breakpoint_id):
         if not breakpoint_id or not is_connected():
             return
@@ -401,26 +1122,55 @@ class SocketHandler(threading.Thread):
         S.SESSION.send(dbgp.BREAKPOINT_REMOVE, d=breakpoint_id)
         S.SESSION.read()
 
-    def set_breakpoint(self, filename, lineno, expression=None):
+    def set_breakpoint(self, filename, lineno, expression=None, hit_value=None, hit_condition=None):
+        transaction = self.request_breakpoint(filename, lineno, expression, hit_value, hit_condition)
+        if transaction is not None:
+            transaction.result()
+
+    def request_breakpoint(self, filename, lineno, expression=None, hit_value=None, hit_condition=None):
+        """
+        Send command for setting breakpoint, returns transaction of command.
+
+        Keyword arguments:
+        filename -- Local path of file.
+        lineno -- Line number of breakpoint.
+        expression -- Condition on which to break.
+        hit_value -- Number of hits on which to break, counted by debugger engine.
+        hit_condition -- How hit value is compared to number of hits (>=, ==, %).
+        """
         if not filename or not lineno or not is_connected():
-            return
+            return None
+
+        # Update breakpoint id when response has been received
+        def set_breakpoint_id(response):
+            breakpoint_id = response.get(dbgp.ATTRIBUTE_BREAKPOINT_ID)
+            if breakpoint_id and filename in S.BREAKPOINT and lineno in S.BREAKPOINT[filename]:
+                S.BREAKPOINT[filename][lineno]['id'] = breakpoint_id
 
         # Get path of file on server
         fileuri = get_real_path(filename, True)
+        # Let debugger engine count hits of breakpoint
+        arguments = {}
+        if hit_value:
+            arguments['h'] = hit_value
+            if hit_condition in dbgp.HIT_CONDITIONS:
+                arguments['o'] = hit_condition
         # Set breakpoint
-        S.SESSION.send(dbgp.BREAKPOINT_SET, t='line', f=fileuri, n=lineno, expression=expression)
-        response = S.SESSION.read()
-        # Update breakpoint id
-        breakpoint_id = response.get(dbgp.ATTRIBUTE_BREAKPOINT_ID)
-        if breakpoint_id:
-            S.BREAKPOINT[filename][lineno]['id'] = breakpoint_id
+        return S.SESSION.request(dbgp.BREAKPOINT_SET, t='line', f=fileuri, n=lineno, expression=expression, callback=set_breakpoint_id, **arguments)
 
     def set_exception(self, exception):
+        transaction = self.request_exception(exception)
+        if transaction is not None:
+            transaction.result()
+
+    def request_exception(self, exception):
+        """
+        Send command for setting exception breakpoint, returns transaction of command.
+        """
         if not is_connected():
-            return
+            return None
 
-        S.SESSION.send(dbgp.BREAKPOINT_SET, t='exception', x='"%s"' % exception)
-        S.SESSION.read()
+        return S.SESSION.request(dbgp.BREAKPOINT_SET, t='exception', x='"%s"' % exception)
 
     def status(self):
         if not is_connected():
@@ -437,8 +1187,7 @@ class SocketHandler(threading.Thread):
             return
 
         # Send command to debugger engine
-        S.SESSION.send(command, args)
-        response = S.SESSION.read(return_string=True)
+        response = S.SESSION.request(command, args, raw=True).result()
 
         # Show response data in output panel
         self.timeout(lambda: show_panel_content(response))
@@ -447,6 +1196,9 @@ class SocketHandler(threading.Thread):
         # Evaluate watch expressions
         self.get_watch_values()
         # Show watch expression
+        self.show_watch_expression()
+
+    def show_watch_expression(self):
         self.timeout(lambda: self._watch_expression(self.get_option('check_watch_view', False)))
 
     def _watch_expression(self, check_watch_view):
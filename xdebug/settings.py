@@ -6,10 +6,16 @@ PACKAGE_PATH = None
 PACKAGE_FOLDER = None
 
 FILE_LOG_OUTPUT = 'Xdebug.log'
+FILE_LOGPOINT_OUTPUT = 'Xdebug.logpoints.jsonl'
 FILE_BREAKPOINT_DATA = 'Xdebug.breakpoints'
 FILE_PACKAGE_SETTINGS = 'Xdebug.sublime-settings'
+FILE_PROFILE_OUTPUT = 'Xdebug.profile.folded'
+FILE_RECORDING_OUTPUT = 'Xdebug.recordings'
 FILE_WATCH_DATA = 'Xdebug.expressions'
 
+# Size in bytes at which logpoint output file is rotated
+LOGPOINT_OUTPUT_SIZE = 1048576
+
 KEY_SETTINGS = 'settings'
 KEY_XDEBUG = 'xdebug'
 
@@ -23,7 +29,13 @@ KEY_MAX_DATA = 'max_data'
 KEY_MAX_DEPTH = 'max_depth'
 KEY_BREAK_ON_START = 'break_on_start'
 KEY_BREAK_ON_EXCEPTION = 'break_on_exception'
+KEY_PROFILE_INTERVAL = 'profile_interval'
 KEY_CLOSE_ON_STOP = 'close_on_stop'
+KEY_CONCURRENT_SESSIONS = 'concurrent_sessions'
+KEY_SESSION_FILTER = 'session_filter'
+KEY_COMMAND_TIMEOUT = 'command_timeout'
+KEY_MAX_RESPONSE_MEMORY = 'max_response_memory'
+KEY_RECORD_SESSION = 'record_session'
 KEY_SUPER_GLOBALS = 'super_globals'
 KEY_FULLNAME_PROPERTY = 'fullname_property'
 KEY_HIDE_PASSWORD = 'hide_password'
@@ -82,20 +94,31 @@ RESTORE_INDEX = None
 SESSION_BUSY = False
 
 SESSION = None
+# Thread which receives data from debugger engines and accepts connections
+EVENT_LOOP = None
+# Socket server which accepts connections from debugger engine
+LISTENER = None
+# Sessions which are waiting to be debugged, while another session is being debugged
+SESSIONS = []
 BREAKPOINT = {}
 CONTEXT_DATA = {}
+# Index of variables in context data, by fullname and name
+CONTEXT_INDEX = {}
 WATCH = []
 
 BREAKPOINT_EXCEPTION = None
 # Breakpoint line number in script being debugged
 BREAKPOINT_ROW = None
-# Placeholder for temporary breakpoint filename and line number
+# Placeholder for filename, line number and id of temporary breakpoint set by debugger engine
 BREAKPOINT_RUN = None
 # Will hold breakpoint line number to show for file which is being loaded
 SHOW_ROW_ONLOAD = {}
 
 CONFIG_PROJECT = None
 CONFIG_PACKAGE = None
+# Configuration snapshot of active window, and snapshots for each window by id
+CONFIG = None
+CONFIG_WINDOW = {}
 CONFIG_KEYS = [
     KEY_PATH_MAPPING,
     KEY_URL,
@@ -107,7 +130,13 @@ CONFIG_KEYS = [
     KEY_MAX_DEPTH,
     KEY_BREAK_ON_START,
     KEY_BREAK_ON_EXCEPTION,
+    KEY_PROFILE_INTERVAL,
     KEY_CLOSE_ON_STOP,
+    KEY_CONCURRENT_SESSIONS,
+    KEY_SESSION_FILTER,
+    KEY_COMMAND_TIMEOUT,
+    KEY_MAX_RESPONSE_MEMORY,
+    KEY_RECORD_SESSION,
     KEY_SUPER_GLOBALS,
     KEY_FULLNAME_PROPERTY,
     KEY_HIDE_PASSWORD,
@@ -47,7 +47,19 @@ class XdebugDeferrableTestCase(DeferrableTestCase):
                     'Xdebug',
                     'Unknown error'
                 ],
+                'profile_interval': 10,
                 'close_on_stop': False,
+                'concurrent_sessions': 'continue',
+                'session_filter': {},
+                'command_timeout': {
+                    'default': 30,
+                    'feature_get': 5,
+                    'feature_set': 5,
+                    'breakpoint_set': 5,
+                    'breakpoint_remove': 5
+                },
+                'max_response_memory': 8388608,
+                'record_session': False,
                 'super_globals': True,
                 'fullname_property': True,
                 'hide_password': False,
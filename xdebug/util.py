@@ -1,9 +1,11 @@
 import sublime
 
+import itertools
 import json
 import os
 import re
 import sys
+import time
 import webbrowser
 
 # Helper module
@@ -269,7 +271,62 @@ def save_breakpoint_data():
         data.write(H.data_write(json.dumps(S.BREAKPOINT)))
 
 
+def save_logpoint_output(records):
+    """
+    Append records of logpoints to output file, one JSON object per line.
+    Previous output is kept in a single backup file when output file exceeds its maximum size.
+    """
+    if not records:
+        return
+    data_path = os.path.join(sublime.packages_path(), 'User', S.FILE_LOGPOINT_OUTPUT)
+    try:
+        if os.path.getsize(data_path) >= S.LOGPOINT_OUTPUT_SIZE:
+            backup_path = data_path + '.1'
+            if os.path.isfile(backup_path):
+                os.remove(backup_path)
+            os.rename(data_path, backup_path)
+    except OSError:
+        pass
+    lines = [json.dumps(record, separators=(',', ':')) + '\n' for record in records]
+    with open(data_path, 'ab') as data:
+        data.write(H.data_write(''.join(lines)))
+
+
+# Sequence number of recordings, distinguishing recordings which are started within the same second
+RECORDING_SEQUENCE = itertools.count(1)
+
+
+def get_recording_path():
+    """
+    Get path of new recording file for session, in recordings folder of User package.
+    """
+    data_path = os.path.join(sublime.packages_path(), 'User', S.FILE_RECORDING_OUTPUT)
+    if not os.path.isdir(data_path):
+        os.makedirs(data_path)
+    filename = '%s-%d.dbgp.gz' % (time.strftime('%Y%m%d-%H%M%S'), next(RECORDING_SEQUENCE))
+    return os.path.join(data_path, filename)
+
+
+def save_profile_output(samples):
+    """
+    Write number of samples by stack to output file in collapsed stack format,
+    each line contains frames separated by a semicolon followed by number of samples.
+    Returns path of output file.
+    """
+    data_path = os.path.join(sublime.packages_path(), 'User', S.FILE_PROFILE_OUTPUT)
+    lines = ['%s %d\n' % (stack, count) for stack, count in samples.items()]
+    with open(data_path, 'wb') as data:
+        data.write(H.data_write(H.unicode_string('').join(lines)))
+    return data_path
+
+
 def save_watch_data():
     data_path = os.path.join(sublime.packages_path(), 'User', S.FILE_WATCH_DATA)
     with open(data_path, 'wb') as data:
-        data.write(H.data_write(json.dumps(S.WATCH)))
+        # Evaluated values are not stored, as these are unset when loading watch data
+        watch_data = []
+        for entry in S.WATCH:
+            entry = dict(entry)
+            entry['value'] = None
+            watch_data.append(entry)
+        data.write(H.data_write(json.dumps(watch_data)))
@@ -23,7 +23,7 @@ except:
     import dbgp
 
 # Config module
-from .config import get_value, get_window_value, set_window_value
+from .config import get_config, get_value, get_window_value, set_window_value
 
 # Util module
 from .util import get_real_path, get_region_icon
@@ -70,9 +70,6 @@ def generate_breakpoint_output():
             breakpoint_entry += '=> %s\n' % filename
             # Sort breakpoint data by line number
             for lineno, bp in sorted(breakpoint_data.items(), key=lambda item: (int(item[0]) if isinstance(item[0], int) or H.is_digit(item[0]) else float('inf'), item[0])):
-                # Do not show temporary breakpoint
-                if S.BREAKPOINT_RUN is not None and S.BREAKPOINT_RUN['filename'] == filename and S.BREAKPOINT_RUN['lineno'] == lineno:
-                    continue
                 # Whether breakpoint is enabled or disabled
                 breakpoint_entry += '\t'
                 if bp['enabled']:
@@ -81,6 +78,12 @@ def generate_breakpoint_output():
                     breakpoint_entry += '|-|'
                 # Line number
                 breakpoint_entry += ' %s' % lineno
+                # Hit count
+                if bp.get('hit_value'):
+                    breakpoint_entry += ' (hit %s %s)' % (bp.get('hit_condition') or dbgp.HIT_CONDITION_GREATER_OR_EQUAL, bp['hit_value'])
+                # Logpoint
+                if bp.get('log'):
+                    breakpoint_entry += ' (log)'
                 # Conditional expression
                 if bp['expression'] is not None:
                     breakpoint_entry += ' -- "%s"' % bp['expression']
@@ -89,6 +92,51 @@ def generate_breakpoint_output():
     return values
 
 
+# Format of property line in context output, by kind of property and whether it has a name
+CONTEXT_TEMPLATE = {
+    ('value', True): '{name} = ({type}) {value}\n'.format,
+    ('value', False): '({type}) {value}\n'.format,
+    ('children', True): '{name} = {type}[{numchildren}]\n'.format,
+    ('children', False): '{type}[{numchildren}]\n'.format,
+    ('unknown', True): '{name} = <{type}>\n'.format,
+    ('unknown', False): '<{type}>\n'.format
+}
+# Indentation of context output for each depth
+CONTEXT_INDENT = ['']
+
+
+def get_context_indent(depth):
+    """
+    Get indentation for depth, which is cached after first use.
+    """
+    while len(CONTEXT_INDENT) <= depth:
+        CONTEXT_INDENT.append(CONTEXT_INDENT[-1] + '\t')
+    return CONTEXT_INDENT[depth]
+
+
+def get_context_kind(variable):
+    """
+    Get kind of property in context data, which determines how it is shown.
+    """
+    # Property with value
+    if variable.has_value():
+        return 'value'
+    # Property with children
+    if variable.children is not None and variable.numchildren is not None:
+        return 'children'
+    # Unknown property
+    return 'unknown'
+
+
+def is_context_truncated(variable):
+    """
+    Check if not all children of property in context data have been received.
+    """
+    if isinstance(variable.numchildren, int) or H.is_digit(variable.numchildren):
+        return int(variable.numchildren) != len(variable.children)
+    return len(variable.children) > 0 and not variable.numchildren
+
+
 def generate_context_output(context, indent=0):
     """
     Generate readable context from dictionary with context data.
@@ -97,58 +145,39 @@ def generate_context_output(context, indent=0):
     context -- Dictionary with context data.
     indent -- Indent level.
     """
-    # Generate output text for values
-    values = H.unicode_string('')
-    if not isinstance(context, dict):
-        return values
-    for variable in context.values():
-        has_children = False
-        property_text = ''
-        # Set indentation
-        for i in range(indent):
-            property_text += '\t'
-        # Property with value
-        if variable['value'] is not None:
-            if variable['name']:
-                property_text += '{name} = '
-            property_text += '({type}) {value}\n'
-        # Property with children
-        elif isinstance(variable['children'], dict) and variable['numchildren'] is not None:
-            has_children = True
-            if variable['name']:
-                property_text += '{name} = '
-            property_text += '{type}[{numchildren}]\n'
-        # Unknown property
-        else:
-            if variable['name']:
-                property_text += '{name} = '
-            property_text += '<{type}>\n'
+    return H.unicode_string('').join(generate_context_lines(context, indent))
+
+
+def generate_context_lines(context, indent=0):
+    """
+    Generator which yields each line of readable context from dictionary with context data.
+
+    Keyword arguments:
+    context -- Dictionary with context data, or list with properties.
+    indent -- Indent level.
+    """
+    indentation = get_context_indent(indent)
+    for variable in get_properties(context):
+        kind = get_context_kind(variable)
+        has_children = kind == 'children'
 
         # Remove newlines in value to prevent incorrect indentation
         value = ''
-        if variable['value'] and len(variable['value']) > 0:
-            value = variable['value'].replace('\r\n', '\n').replace('\n', ' ')
+        if variable.value and len(variable.value) > 0:
+            value = variable.value.replace('\r\n', '\n').replace('\n', ' ')
 
         # Format string and append to output
-        values += H.unicode_string(property_text
-                                   .format(value=value, type=variable['type'], name=variable['name'], numchildren=variable['numchildren']))
+        template = CONTEXT_TEMPLATE[(kind, bool(variable.name))]
+        yield H.unicode_string(indentation + template(value=value, type=variable.type, name=variable.name, numchildren=variable.numchildren))
 
         # Append property children to output
         if has_children:
             # Get children for property (no need to convert, already unicode)
-            values += generate_context_output(variable['children'], indent + 1)
+            for line in generate_context_lines(variable.children, indent + 1):
+                yield line
             # Use ellipsis to indicate that results have been truncated
-            limited = False
-            if isinstance(variable['numchildren'], int) or H.is_digit(variable['numchildren']):
-                if int(variable['numchildren']) != len(variable['children']):
-                    limited = True
-            elif len(variable['children']) > 0 and not variable['numchildren']:
-                limited = True
-            if limited:
-                for i in range(indent + 1):
-                    values += H.unicode_string('\t')
-                values += H.unicode_string('...\n')
-    return values
+            if is_context_truncated(variable):
+                yield H.unicode_string(get_context_indent(indent + 1) + '...\n')
 
 
 def generate_stack_output(response):
@@ -221,16 +250,129 @@ def get_context_variable(context, variable_name):
     context -- Dictionary with context data to search.
     variable_name -- Name of variable to find.
 
-    TODO: Retrieving of context variable when using short variable name
+    NOTE: Variables of current session are found by row in context window with find_context_variable.
+    """
+    if isinstance(context, dict) and variable_name in context:
+        return context[variable_name]
+    properties = get_properties(context)
+    for variable in properties:
+        if variable.fullname == variable_name:
+            return variable
+    for variable in properties:
+        if variable.children:
+            children = get_context_variable(variable.children, variable_name)
+            if children:
+                return children
+
+
+def index_context(context):
+    """
+    Create index of all rows in output of context data, for finding the variable shown on a row without searching the context data.
+    Each variable is found by the row on which it is shown, which maps to an entry with the variable,
+    range of rows (begin/end) in output of context data and id of context to which it belongs.
+    A row with ellipsis maps to the entry of the variable which children have been truncated.
+
+    Keyword arguments:
+    context -- Dictionary with context data to index.
+    """
+    index = {}
+    index_context_variables(index, context)
+    return index
+
+
+def index_context_variables(index, context, row=0, context_id=None):
     """
-    if isinstance(context, dict):
-        if variable_name in context:
-            return context[variable_name]
-        for variable in context.values():
-            if isinstance(variable['children'], dict):
-                children = get_context_variable(variable['children'], variable_name)
-                if children:
-                    return children
+    Add variables in context data to index, returns row following the last variable.
+    """
+    for variable in get_properties(context):
+        entry = {'variable': variable, 'begin': row, 'end': row, 'context': variable.context if variable.context is not None else context_id}
+        index[row] = entry
+        row += 1
+        if get_context_kind(variable) == 'children':
+            row = index_context_variables(index, variable.children, row, entry['context'])
+            # Row with ellipsis
+            if is_context_truncated(variable):
+                index[row] = entry
+                row += 1
+        entry['end'] = row - 1
+    return row
+
+
+def find_context_variable(row):
+    """
+    Find entry of variable shown on row in context window, see index_context().
+
+    Keyword arguments:
+    row -- Row in context window.
+    """
+    if S.CONTEXT_INDEX and row in S.CONTEXT_INDEX:
+        return S.CONTEXT_INDEX[row]
+    return None
+
+
+def get_context_variables():
+    """
+    Get entries of all variables in index of context data, in order of context window.
+    """
+    return [entry for (row, entry) in sorted(S.CONTEXT_INDEX.items()) if row == entry['begin']]
+
+
+def get_context_line_variable(view, point=None):
+    """
+    Get entry of variable on line in context window.
+    For a line with ellipsis the entry of the variable which children have been truncated is returned.
+
+    Keyword arguments:
+    view -- View reference which holds the context window.
+    point -- Point of line, defaults to current selection.
+    """
+    if point is None:
+        if not view.sel():
+            return None
+        point = view.sel()[0].a
+    return find_context_variable(view.rowcol(point)[0])
+
+
+def unfold_context_variable(row):
+    """
+    Unfold children of variable in context window.
+
+    Keyword arguments:
+    row -- Row on which variable is shown in context window.
+    """
+    entry = find_context_variable(row)
+    if entry is None or entry['end'] <= entry['begin']:
+        return
+    for view in sublime.active_window().views():
+        if view.name() == TITLE_WINDOW_CONTEXT:
+            begin = view.line(view.text_point(entry['begin'], 0))
+            end = view.line(view.text_point(entry['end'], 0))
+            view.unfold(sublime.Region(begin.b, end.b))
+
+
+def show_context_variable(row):
+    """
+    Focus line of variable in context window.
+
+    Keyword arguments:
+    row -- Row on which variable is shown in context window.
+    """
+    entry = find_context_variable(row)
+    if entry is None:
+        return
+    window = sublime.active_window()
+    for view in window.views():
+        if view.name() == TITLE_WINDOW_CONTEXT:
+            line = view.line(view.text_point(entry['begin'], 0))
+            # Unfold variable when it is hidden in children of other variable
+            view.unfold(line)
+            # Select start of name of variable
+            text = view.substr(line)
+            point = line.a + len(text) - len(text.lstrip('\t'))
+            window.focus_view(view)
+            view.sel().clear()
+            view.sel().add(sublime.Region(point))
+            view.show_at_center(point)
 
 
 def get_debug_index(name=None):
@@ -244,14 +386,15 @@ def get_debug_index(name=None):
     name -- Name of debug view to get group/index position.
     """
     # Set group and index for each debug view
-    breakpoint_group = get_value(S.KEY_BREAKPOINT_GROUP, -1)
-    breakpoint_index = get_value(S.KEY_BREAKPOINT_INDEX, 0)
-    context_group = get_value(S.KEY_CONTEXT_GROUP, -1)
-    context_index = get_value(S.KEY_CONTEXT_INDEX, 0)
-    stack_group = get_value(S.KEY_STACK_GROUP, -1)
-    stack_index = get_value(S.KEY_STACK_INDEX, 0)
-    watch_group = get_value(S.KEY_WATCH_GROUP, -1)
-    watch_index = get_value(S.KEY_WATCH_INDEX, 0)
+    config = get_config()
+    breakpoint_group = config.get(S.KEY_BREAKPOINT_GROUP, -1)
+    breakpoint_index = config.get(S.KEY_BREAKPOINT_INDEX, 0)
+    context_group = config.get(S.KEY_CONTEXT_GROUP, -1)
+    context_index = config.get(S.KEY_CONTEXT_INDEX, 0)
+    stack_group = config.get(S.KEY_STACK_GROUP, -1)
+    stack_index = config.get(S.KEY_STACK_INDEX, 0)
+    watch_group = config.get(S.KEY_WATCH_GROUP, -1)
+    watch_index = config.get(S.KEY_WATCH_INDEX, 0)
 
     # Create list with all debug views and sort by group/index
     debug_list = []
@@ -297,6 +440,118 @@ def get_debug_index(name=None):
     return sorted_list
 
 
+class Property(object):
+    """
+    Property (variable) from response of debugger engine.
+
+    Uses fixed attributes instead of a dictionary to reduce memory usage for large contexts,
+    attributes can also be accessed as keys of a dictionary, e.g. property['name'].
+
+    Encoded values are kept as received and only decoded when value is accessed for the first time,
+    replacing the encoded value. Context window shows all received values, including folded children,
+    so this only avoids decoding values which are never shown, such as values hidden by hide_password.
+    """
+    __slots__ = ('name', 'fullname', 'type', 'raw_value', 'encoding', 'numchildren', 'children', 'page', 'pagesize', 'context')
+
+    # Attributes which are available as keys of a dictionary
+    attributes = ('name', 'fullname', 'type', 'value', 'numchildren', 'children', 'page', 'pagesize', 'context')
+
+    def __init__(self, name=None, type=None, value=None, numchildren=None, children=None, fullname=None, page=None, pagesize=None, context=None, encoding=None):
+        """
+        Keyword arguments:
+        name -- Name of property which is shown.
+        type -- Type or classname of property.
+        value -- Value of property.
+        numchildren -- Number of children of property.
+        children -- List with properties of children which have been received.
+        fullname -- Fullname of property, used for retrieving property from debugger engine.
+        page -- Page of children which have been received.
+        pagesize -- Number of children for each page.
+        context -- Id of context to which property belongs.
+        encoding -- Encoding of value, which is decoded on first access.
+        """
+        self.name = name
+        self.fullname = fullname
+        self.type = H.intern_string(type)
+        self.raw_value = value
+        self.encoding = encoding if value is not None else None
+        self.numchildren = H.intern_string(numchildren)
+        self.children = children
+        self.page = H.intern_string(page)
+        self.pagesize = H.intern_string(pagesize)
+        self.context = context
+
+    def get_value(self):
+        # Decode value once, keeping decoded value instead of encoded value
+        if self.encoding is not None:
+            if self.encoding == 'base64':
+                try:
+                    self.raw_value = H.base64_decode(self.raw_value)
+                except:
+                    pass
+            self.encoding = None
+        return self.raw_value
+
+    def set_value(self, value):
+        self.raw_value = value
+        self.encoding = None
+
+    value = property(get_value, set_value)
+
+    def has_value(self):
+        """
+        Check if property has a value, without decoding it.
+        """
+        return self.raw_value is not None
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.attributes
+
+    def get(self, key, default_value=None):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            return default_value
+
+    def keys(self):
+        return list(self.attributes)
+
+
+def get_properties(properties):
+    """
+    Get list of properties from dictionary or list with properties.
+    """
+    if isinstance(properties, dict):
+        return H.dictionary_values(properties)
+    if isinstance(properties, list):
+        return properties
+    return []
+
+
+def get_property_value(property):
+    """
+    Get plain value of property, children which have been received are returned as dictionary of values by name.
+    """
+    if property.children:
+        values = H.new_dictionary()
+        for child in property.children:
+            values[child.name] = get_property_value(child)
+        return values
+    return property.value
+
+
 def get_response_properties(response, default_key=None):
     """
     Return a dictionary with available properties from response.
@@ -308,79 +563,132 @@ def get_response_properties(response, default_key=None):
     properties = H.new_dictionary()
     # Walk through elements in response
     for child in response:
-        # Read property elements
-        if child.tag == dbgp.ELEMENT_PROPERTY or child.tag == dbgp.ELEMENT_PATH_PROPERTY:
-            # Get property attribute values
-            property_name = child.get(dbgp.PROPERTY_NAME)
-            property_fullname = child.get(dbgp.PROPERTY_FULLNAME, property_name)
-            property_type = child.get(dbgp.PROPERTY_TYPE)
-            property_children = child.get(dbgp.PROPERTY_CHILDREN)
-            property_numchildren = child.get(dbgp.PROPERTY_NUMCHILDREN)
-            property_classname = child.get(dbgp.PROPERTY_CLASSNAME)
-            property_encoding = child.get(dbgp.PROPERTY_ENCODING)
-            property_facet = child.get(dbgp.PROPERTY_FACET)
-            property_value = None
-
-            # Set property value
-            if child.text:
-                property_value = child.text
-                # Try to decode property value when encoded with base64
-                if property_encoding is not None and property_encoding == 'base64':
-                    try:
-                        property_value = H.base64_decode(child.text)
-                    except:
-                        pass
-
-            if property_fullname is not None and len(property_fullname) > 0:
-                property_key = property_fullname
-                # Ignore following properties
-                if property_fullname == '::':
-                    continue
-
-                # Avoid nasty static functions/variables from turning in an infinitive loop
-                if property_fullname.count('::') > 1:
-                    continue
-
-                # Prevent nested child which is a static public reference to it's parent from showing more than once
-                if property_facet == 'static public' and (response.tag == dbgp.ELEMENT_PROPERTY or response.tag == dbgp.ELEMENT_PATH_PROPERTY):
-                    parent_classname = response.get(dbgp.PROPERTY_CLASSNAME)
-                    parent_fullname = response.get(dbgp.PROPERTY_FULLNAME, response.get(dbgp.PROPERTY_NAME))
-                    if property_fullname == parent_fullname and property_classname == parent_classname:
-                        continue
-
-                # Filter potential password values
-                if get_value(S.KEY_HIDE_PASSWORD, True) and property_fullname.lower().find('password') != -1 and property_value is not None:
-                    property_value = '******'
-            else:
-                property_key = default_key
-
-            # Store property
-            if property_key:
-                properties[property_key] = {'name': property_name, 'type': property_type, 'value': property_value, 'numchildren': property_numchildren, 'children': None}
-
-                # Use fullname for property name
-                if get_value(S.KEY_FULLNAME_PROPERTY, True):
-                    properties[property_key]['name'] = property_fullname
-
-                # Get values for children
-                if property_children:
-                    properties[property_key]['children'] = get_response_properties(child, default_key)
-
-                # Set classname, if available, as type for object
-                if property_classname and property_type == 'object':
-                    properties[property_key]['type'] = property_classname
-        # Handle error elements
-        elif child.tag == dbgp.ELEMENT_ERROR or child.tag == dbgp.ELEMENT_PATH_ERROR:
-            message = 'error'
-            for step_child in child:
-                if step_child.tag == dbgp.ELEMENT_MESSAGE or step_child.tag == dbgp.ELEMENT_PATH_MESSAGE and step_child.text:
-                    message = step_child.text
-                    break
-            if default_key:
-                properties[default_key] = {'name': None, 'type': message, 'value': None, 'numchildren': None, 'children': None}
+        set_response_property(properties, child, response, default_key)
     return properties
 
 
+def get_response_children(response, default_key=None):
+    """
+    Return a list with available properties from response, used for children of property.
+
+    Keyword arguments:
+    response -- Property element from debugger engine.
+    default_key -- Index key to use when property has no name.
+    """
+    children = []
+    # Position of each property by key, property with same key replaces previous property
+    positions = {}
+    for child in response:
+        response_property = get_response_property(child, response, default_key)
+        if response_property is not None:
+            property_key, value = response_property
+            if property_key in positions:
+                children[positions[property_key]] = value
+            else:
+                positions[property_key] = len(children)
+                children.append(value)
+    return children
+
+
+def set_response_property(properties, child, response, default_key=None):
+    """
+    Store property from element of response in dictionary with properties.
+
+    Keyword arguments:
+    properties -- Dictionary in which to store property.
+    child -- Element of response from debugger engine.
+    response -- Response (or parent property) which contains element.
+    default_key -- Index key to use when property has no name.
+    """
+    response_property = get_response_property(child, response, default_key)
+    if response_property is not None:
+        property_key, value = response_property
+        properties[property_key] = value
+
+
+def get_response_property(child, response, default_key=None):
+    """
+    Get property from element of response.
+    Returns tuple with key and property, or None when element is not a property or should be ignored.
+
+    Keyword arguments:
+    child -- Element of response from debugger engine.
+    response -- Response (or parent property) which contains element.
+    default_key -- Index key to use when property has no name.
+    """
+    # Read property elements
+    if child.tag == dbgp.ELEMENT_PROPERTY or child.tag == dbgp.ELEMENT_PATH_PROPERTY:
+        config = get_config()
+        # Get property attribute values
+        property_name = child.get(dbgp.PROPERTY_NAME)
+        property_fullname = child.get(dbgp.PROPERTY_FULLNAME, property_name)
+        property_type = child.get(dbgp.PROPERTY_TYPE)
+        property_children = child.get(dbgp.PROPERTY_CHILDREN)
+        property_numchildren = child.get(dbgp.PROPERTY_NUMCHILDREN)
+        property_classname = child.get(dbgp.PROPERTY_CLASSNAME)
+        property_encoding = child.get(dbgp.PROPERTY_ENCODING)
+        property_facet = child.get(dbgp.PROPERTY_FACET)
+        property_page = child.get(dbgp.PROPERTY_PAGE)
+        property_pagesize = child.get(dbgp.PROPERTY_PAGESIZE)
+        property_value = None
+
+        # Set property value, which is decoded when it is used
+        if child.text:
+            property_value = child.text
+
+        if property_fullname is not None and len(property_fullname) > 0:
+            property_key = property_fullname
+            # Ignore following properties
+            if property_fullname == '::':
+                return None
+
+            # Avoid nasty static functions/variables from turning in an infinitive loop
+            if property_fullname.count('::') > 1:
+                return None
+
+            # Prevent nested child which is a static public reference to it's parent from showing more than once
+            if property_facet == 'static public' and (response.tag == dbgp.ELEMENT_PROPERTY or response.tag == dbgp.ELEMENT_PATH_PROPERTY):
+                parent_classname = response.get(dbgp.PROPERTY_CLASSNAME)
+                parent_fullname = response.get(dbgp.PROPERTY_FULLNAME, response.get(dbgp.PROPERTY_NAME))
+                if property_fullname == parent_fullname and property_classname == parent_classname:
+                    return None
+
+            # Filter potential password values
+            if config.get(S.KEY_HIDE_PASSWORD, True) and property_fullname.lower().find('password') != -1 and property_value is not None:
+                property_value = '******'
+                property_encoding = None
+        else:
+            property_key = default_key
+
+        if not property_key:
+            return None
+
+        # Use fullname for property name
+        if config.get(S.KEY_FULLNAME_PROPERTY, True):
+            property_name = property_fullname
+
+        # Set classname, if available, as type for object
+        if property_classname and property_type == 'object':
+            property_type = property_classname
+
+        # Get values for children
+        children = None
+        if property_children:
+            children = get_response_children(child, default_key)
+
+        return property_key, Property(property_name, property_type, property_value, property_numchildren, children, property_fullname, property_page, property_pagesize, encoding=property_encoding)
+    # Handle error elements
+    elif child.tag == dbgp.ELEMENT_ERROR or child.tag == dbgp.ELEMENT_PATH_ERROR:
+        message = 'error'
+        for step_child in child:
+            if step_child.tag == dbgp.ELEMENT_MESSAGE or step_child.tag == dbgp.ELEMENT_PATH_MESSAGE and step_child.text:
+                message = step_child.text
+                break
+        if default_key:
+            return default_key, Property(type=message)
+    return None
+
+
 def has_debug_view(name=None):
     """
     Determine if active window has any or specific debug view(s).
@@ -555,9 +863,12 @@ def show_content(data, content=None):
     view.settings().set('word_wrap', False)
     view.settings().set('syntax', 'Packages/' + package + '/Xdebug.tmLanguage')
 
-    # Set content for view and fold all indentation blocks
-    view.run_command('xdebug_view_update', {'data': content, 'readonly': True})
-    if data == DATA_CONTEXT or data == DATA_WATCH:
+    # Set content for view, only changed lines are replaced when view already has content
+    foldable = data == DATA_CONTEXT or data == DATA_WATCH
+    initial = view.size() == 0
+    view.run_command('xdebug_view_update', {'data': content, 'readonly': True, 'incremental': True, 'fold': foldable})
+    # Fold all indentation blocks when view is populated
+    if foldable and initial:
         view.run_command('fold_all')
 
     # Restore focus to previous active view/group
@@ -588,7 +899,8 @@ def show_context_output(view):
                 if match:
                     # Get variable details from context data
                     variable_name = match.group(1)
-                    variable = get_context_variable(S.CONTEXT_DATA, variable_name)
+                    entry = find_context_variable(view.rowcol(point.a)[0])
+                    variable = entry['variable'] if entry else get_context_variable(S.CONTEXT_DATA, variable_name)
                     if variable:
                         # Convert details to text output
                         variables = H.new_dictionary()
@@ -644,6 +956,22 @@ def show_panel_content(content):
         print(content)
 
 
+def append_panel_content(content):
+    # Add output of logpoints to output panel, keeping previous output
+    try:
+        window = sublime.active_window()
+        # Existing output panel is only available in Sublime Text 3, otherwise output panel is (re)created
+        panel = None
+        if hasattr(window, 'find_output_panel'):
+            panel = window.find_output_panel('xdebug_log')
+        if panel is None:
+            panel = window.get_output_panel('xdebug_log')
+        panel.run_command('xdebug_view_update', {'data': content, 'append': True})
+        window.run_command('show_panel', {'panel': 'output.xdebug_log'})
+    except:
+        print(content)
+
+
 def show_at_row(view, row=None):
     """
     Scroll the view to center on the given row (line number).
@@ -790,9 +1118,6 @@ def render_regions(view=None):
     disabled_rows = []
     if filename in S.BREAKPOINT and isinstance(S.BREAKPOINT[filename], dict):
         for lineno, bp in S.BREAKPOINT[filename].items():
-            # Do not show temporary breakpoint
-            if S.BREAKPOINT_RUN is not None and S.BREAKPOINT_RUN['filename'] == filename and S.BREAKPOINT_RUN['lineno'] == lineno:
-                continue
             # Determine if breakpoint is enabled or disabled
             if bp['enabled']:
                 breakpoint_rows.append(lineno)